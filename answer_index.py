@@ -0,0 +1,100 @@
+import numpy as np
+
+
+def normalize(embs):
+    '''return embs with rows scaled to unit length, zero rows stay zero'''
+    embs = np.asarray(embs, dtype=np.float32)
+    norms = np.linalg.norm(embs, axis=1, keepdims=True)
+    return embs / np.where(norms == 0, 1, norms)
+
+
+class AnswerIndex():
+    '''
+    Normalized embeddings of the form answer keys, to match form elements against large answer banks
+    without dense similarity matrices or a dense assignment:
+    keys are pruned to the top k candidates of each element, then matched with a sparse bipartite matching
+    '''
+
+    def __init__(self, key_embs: np.ndarray) -> None:
+        '''
+        Parameters
+        ----------
+        key_embs : numpy.ndarray
+            one embedding row per form answer key
+        '''
+        self.embs = normalize(key_embs)
+
+    def __len__(self):
+        return len(self.embs)
+
+    def top_k(self, context_embs: np.ndarray, el_embs: np.ndarray, k: int):
+        '''
+        return the k keys of highest context + element similarity for each element
+
+            Parameters
+            ----------
+            context_embs : numpy.ndarray
+                one embedding row per element context
+            el_embs : numpy.ndarray
+                one embedding row per element description
+            k : int
+                number of candidate keys per element
+
+            Returns
+            -------
+            tuple[numpy.ndarray, numpy.ndarray]
+                (n elements, k) arrays of candidate key indexes and of their similarity, unordered
+        '''
+        # cosine similarity is linear in the normalized query, so both similarities add up with one product
+        similarities = (normalize(context_embs) + normalize(el_embs)) @ self.embs.T
+        k = min(k, len(self.embs))
+        candidates = np.argpartition(-similarities, k-1, axis=1)[:, :k]
+        return candidates, np.take_along_axis(similarities, candidates, axis=1)
+
+    def pair_similarities(self, embs: np.ndarray, key_indexes: np.ndarray):
+        '''return the cosine similarity of each row of embs with its key of key_indexes'''
+        return (normalize(embs) * self.embs[key_indexes]).sum(axis=1)
+
+    def best(self, context_embs: np.ndarray, el_embs: np.ndarray):
+        '''return the index of the key of highest context + element similarity for each element'''
+        return ((normalize(context_embs) + normalize(el_embs)) @ self.embs.T).argmax(axis=1)
+
+    def assign(self, context_embs: np.ndarray, el_embs: np.ndarray, k=16):
+        '''
+        return a different key for each element, maximizing the total context + element similarity among each element's top k keys.
+        k is doubled until every element can get a different key, so with enough keys there is always an answer
+
+            Parameters
+            ----------
+            context_embs : numpy.ndarray
+                one embedding row per element context
+            el_embs : numpy.ndarray
+                one embedding row per element description, no more elements than keys
+            k : int, default 16
+                number of candidate keys per element to start with
+
+            Returns
+            -------
+            numpy.ndarray
+                index of the key of each element
+        '''
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+        n = len(context_embs)
+        if not n:
+            return np.empty(0, dtype=np.int64)
+        while True:
+            candidates, similarities = self.top_k(context_embs, el_embs, k)
+            # minimum cost matching, costs must be positive as explicit zeros count as missing edges
+            costs = similarities.max() - similarities + 1
+            graph = csr_matrix((costs.ravel(), (np.repeat(np.arange(n), candidates.shape[1]), candidates.ravel())), shape=(n, len(self.embs)))
+            try:
+                rows, cols = min_weight_full_bipartite_matching(graph)
+            except ValueError: # the candidates can't give every element a different key
+                if k >= len(self.embs):
+                    raise
+                k *= 2
+                continue
+            key_indexes = np.empty(n, dtype=np.int64)
+            key_indexes[rows] = cols
+            return key_indexes
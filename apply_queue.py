@@ -0,0 +1,183 @@
+import copy
+import datetime
+import os
+import threading
+import time
+
+from selenium import webdriver
+
+from daemon import RemoteMatcher
+from profiling import Metrics
+from scraper import headless_chrome
+
+
+def isolated_chrome_factory(profiles_folder: str, headless=False):
+    '''
+    return a driver factory starting chrome with a separate persistent profile per session (profiles_folder/session_0, session_1, ...),
+    so sessions don't share cookies or logins and each profile stays logged into the portals it was used on
+    '''
+    counter = iter(range(10**6))
+    lock = threading.Lock()
+
+    def factory():
+        with lock:
+            n = next(counter)
+        options = webdriver.ChromeOptions()
+        options.add_argument('--user-data-dir='+os.path.abspath(os.path.join(profiles_folder, 'session_'+str(n))))
+        if headless:
+            options.add_argument('--headless=new')
+        return webdriver.Chrome(options=options)
+    return factory
+
+
+class SharedMatcher():
+    '''the matching methods of one AutoApply, shared by the sessions of an ApplyQueue one call at a time'''
+
+    def __init__(self, auto_app) -> None:
+        self.auto_app = auto_app
+        self.lock = threading.Lock()
+
+    @property
+    def form_answers_hash(self):
+        '''hash of the answers and model matched with, so sessions can replay forms from the form cache'''
+        self.auto_app.answers_future.result()
+        return self.auto_app.form_answers_hash
+
+    def get_form_answers(self, contexts: list[str], form_els: list[str], assign=True):
+        with self.lock:
+            return self.auto_app.get_form_answers(contexts, form_els, assign)
+
+    def get_best_options(self, option_texts: list[list[str]], contexts: list[str], form_els: list[str]):
+        with self.lock:
+            answers = self.auto_app.get_form_answers(contexts, form_els, assign=False)
+            return self.auto_app.best_option_indexes(answers, option_texts)
+
+
+class Application():
+    '''a job whose application page was opened and autofilled by an ApplyQueue session, waiting for review'''
+
+    def __init__(self, index: int, job: dict) -> None:
+        self.index = index
+        self.job = job
+        self.driver = None # the session's driver, showing the filled application page
+        self.error = None # exception raised while opening or filling the page, if any
+        self.seconds = None # time spent opening and filling the page
+        self.applied = False # set to True once the application was submitted, to record it with log_applied()
+
+
+class ApplyQueue():
+    '''
+    Opens and autofills the application pages of many jobs at once, each in one of a pool of browser sessions,
+    and hands them over for review in the order of the jobs. A session only moves on to the next job once its page was reviewed,
+    so at most n_sessions pages are filled ahead of the one being reviewed.
+    All sessions share the model and answers of one AutoApply (or a matching daemon), no session loads its own
+    '''
+
+    def __init__(self, auto_app, driver_factory=headless_chrome, n_sessions=4, delay=0., matcher: str=None, inject=False) -> None:
+        '''
+        Parameters
+        ----------
+        auto_app : AutoApply
+            provides the model, the answers and the job history applications are recorded in
+        driver_factory : callable, default headless_chrome
+            returns a new selenium driver, called once per session. For human review, use visible sessions,
+            e.g. isolated_chrome_factory() for a separate chrome profile per session
+        n_sessions : int, default 4
+            number of browser sessions
+        delay : float, default 0.
+            time in seconds to wait before each input, see AutoApply.autofill_current_page()
+        matcher : str, default None
+            address of a matching daemon to share instead of auto_app's model, see daemon.py
+        inject : bool, default False
+            if True, set the values of each page in bulk instead of typing them, see AutoApply.autofill_current_page()
+        '''
+        self.auto_app = auto_app
+        self.driver_factory = driver_factory
+        self.n_sessions = n_sessions
+        self.delay = delay
+        self.inject = inject
+        self.matcher = RemoteMatcher(matcher) if matcher else auto_app.matcher or SharedMatcher(auto_app)
+
+    def make_session(self, driver):
+        '''return a copy of auto_app driving its own browser, matching through the shared matcher'''
+        session = copy.copy(self.auto_app)
+        session.driver = driver
+        session.matcher = self.matcher
+        session.incremental_state = {}
+        session.metrics = Metrics(self.auto_app.metrics.path, self.auto_app.metrics.profile)
+        return session
+
+    def prepare(self, session, application: Application):
+        t = time.perf_counter()
+        try:
+            session.navigator.navigate(session.driver, application.job['apply_url'], sleep=session.metrics.sleep)
+            session.autofill_current_page(self.delay, snapshot=True, inject=self.inject)
+        except Exception as e:
+            print('Warning: could not autofill', application.job['apply_url'], 'resulted in:')
+            print(e)
+            application.error = e
+        application.seconds = time.perf_counter() - t
+        application.driver = session.driver
+
+    def work(self, session, state: dict):
+        while True:
+            with state['condition']:
+                if state['stop'] or state['next'] >= len(state['jobs']):
+                    return
+                index = state['next']
+                state['next'] += 1
+            application = Application(index, state['jobs'][index])
+            self.prepare(session, application)
+            with state['condition']:
+                state['ready'][index] = application
+                state['condition'].notify_all()
+                # hold the page until it was reviewed
+                state['condition'].wait_for(lambda: state['stop'] or index in state['reviewed'])
+
+    def run(self, jobs: list[dict]):
+        '''
+        open and autofill the application page of every job, yielding each once it is ready, in the order of jobs.
+        Review the page in application.driver, set application.applied to True if it was submitted,
+        the next iteration records it (log_applied()) and frees its session.
+        Jobs are also recorded as seen when yielded, as with view_jobs()
+
+            Parameters
+            ----------
+            jobs : list[dict]
+                jobs to apply to, e.g. the output of AutoApply.filter_jobs()
+
+            Yields
+            ------
+            Application
+                job with its filled page, in the order of jobs
+        '''
+        state = {'jobs': jobs, 'next': 0, 'ready': {}, 'reviewed': set(), 'stop': False, 'condition': threading.Condition()}
+        drivers, workers = [], []
+        try:
+            for _ in range(min(self.n_sessions, len(jobs))): # the drivers started before one fails to are quit below
+                drivers.append(self.driver_factory())
+            workers = [threading.Thread(target=self.work, args=(self.make_session(driver), state), daemon=True) for driver in drivers]
+            for w in workers:
+                w.start()
+            for index in range(len(jobs)):
+                with state['condition']:
+                    state['condition'].wait_for(lambda: index in state['ready'])
+                    application = state['ready'].pop(index)
+                job = application.job
+                job['date_seen'] = datetime.datetime.now()
+                self.auto_app.storage.append('seen', [job])
+                self.auto_app.seen_index.sync()
+                yield application
+                if application.applied:
+                    self.auto_app.log_applied([job])
+                with state['condition']:
+                    state['reviewed'].add(index)
+                    state['condition'].notify_all()
+        finally:
+            with state['condition']: # if the consumer stopped early, the remaining jobs are dropped
+                state['stop'] = True
+                state['condition'].notify_all()
+            for w in workers:
+                w.join()
+            for driver in drivers:
+                driver.quit()
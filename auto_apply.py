@@ -1,27 +1,116 @@
 import datetime
+import hashlib
 import os
 import json
-from collections import Counter
-from copy import deepcopy
+from collections import Counter, OrderedDict, deque
+from copy import copy
 import time
+import socket
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
 
 from selenium import webdriver
 import selenium
 from bs4 import BeautifulSoup
 import bs4
 from selenium.webdriver.common.by import By
-import jsonlines as jsonl
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from scipy.optimize import linear_sum_assignment
-from sentence_transformers import SentenceTransformer
-
-from utils import datetime_parser, datetime_serializer
+import numpy as np
+
+from utils import UnkStripper, url_key, cosine_similarity
+from embedding_store import EmbeddingStore
+from encoders import make_encoder, encoder_name
+from answer_index import AnswerIndex
+from daemon import RemoteMatcher
+from form_cache import FormCache
+from blob_store import BlobStore
+from scraper import ScrapePool, headless_chrome
+from navigation import NavigationScheduler, Blocked
+from seen_index import SeenIndex, job_fingerprints
+from near_duplicates import NearDuplicateIndex
+from relevance import RelevanceIndex
+from history import HistoryExport
+from storage import JsonlStorage, SqliteStorage
+from profiling import Metrics
+from parsing import parse_html, default_html_parser, form_control_names, search_page_strainer, description_page_strainer, form_root_js, normalize_whitespace, page_text
 
 
 places = ['first', 'second', 'third', 'fourth', 'fifth', 'sixth', 'seventh', 'eighth', 'ninth', 'tenth']
 text_types = ['text', 'email', "date", "datetime-local", "month", "number", "password", "search", "tel", "time", "url", "week"] # not sure all of these are really considered text, might break send_keys()
 xforbid = ['$', '{', '}']
+snapshot_id_attr = 'data-autoapply-id'
+# tags every form control (and option) with a stable id and returns everything autofill needs to know about them in one round trip
+snapshot_js = '''
+const attr = arguments[0];
+const controls = document.querySelectorAll('input, select, textarea, datalist, optgroup, option');
+window.__autoApplyNextId = window.__autoApplyNextId || 0;
+for (const el of controls) {
+    if (!el.hasAttribute(attr)) el.setAttribute(attr, String(window.__autoApplyNextId++));
+}
+function displayed(el) {
+    if (el.tagName === 'OPTION' || el.tagName === 'OPTGROUP') {
+        const select = el.closest('select');
+        return select !== null && displayed(select);
+    }
+    if (el.tagName === 'DATALIST' || el.type === 'hidden') return false;
+    const style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden' || style.visibility === 'collapse' || parseFloat(style.opacity) === 0) return false;
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0;
+}
+return Array.from(controls, el => ({
+    id: el.getAttribute(attr),
+    tag: el.tagName.toLowerCase(),
+    element: el,
+    displayed: displayed(el),
+    enabled: !el.matches(':disabled'),
+    value: el.value === undefined ? null : String(el.value),
+    options: el.tagName === 'SELECT' ? Array.from(el.options, o => o.getAttribute(attr)) : [],
+}));
+'''
+# counts the page's structural changes (added or removed nodes, style, class, hidden and disabled changes) from its first call on a document,
+# returns a token identifying the document and the count so far
+watch_js = '''
+if (!window.__autoApplyObserver) {
+    window.__autoApplyPage = Date.now() + '-' + Math.random();
+    window.__autoApplyMutations = 0;
+    window.__autoApplyObserver = new MutationObserver(records => { window.__autoApplyMutations += records.length; });
+    window.__autoApplyObserver.observe(document.documentElement, {childList: true, subtree: true, attributes: true, attributeFilter: ['style', 'class', 'hidden', 'disabled']});
+}
+return [window.__autoApplyPage, window.__autoApplyMutations];
+'''
+# sets the value of text controls and selects options, for each [element, value, value read back] entry ([option, null, null] for options)
+# whose value isn't already set, with the input, change and blur events a user's input would fire so that framework based forms (React, Angular, Vue) register it.
+# The value read back is null until the entry was set once.
+# Returns [indexes of the entries it had to set, the values read back from them, indexes of the entries whose element is no longer on the page,
+# indexes of the entries whose value the control rejected]
+inject_js = '''
+const entries = arguments[0];
+const changed = [], values = [], detached = [], rejected = [];
+function fire(el, type) {
+    el.dispatchEvent(type === 'blur' ? new FocusEvent(type) : new Event(type, {bubbles: true}));
+}
+entries.forEach(([el, value, held], i) => {
+    if (!el.isConnected) return detached.push(i);
+    let target = el;
+    if (el.tagName === 'OPTION') {
+        if (el.selected) return;
+        target = el.closest('select') || el;
+        el.selected = true;
+    } else {
+        // compared to what the browser read back after the first set, which may differ from value: trimmed emails, normalized line breaks
+        if (el.value === (held === null ? value : held)) return;
+        // the prototype's setter, as React tracks values set through the element's own
+        const proto = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, value);
+        if (value !== '' && el.value === '') return rejected.push(i); // e.g. text in a number or date input
+    }
+    changed.push(i);
+    values.push(el.value);
+    for (const type of ['input', 'change', 'blur']) fire(target, type);
+});
+return [changed, values, detached, rejected];
+'''
 
 class AutoApply():
     '''
@@ -31,58 +120,197 @@ class AutoApply():
 
     def __init__(
         self,
-        folder_name='file_templates/'
+        folder_name='file_templates/',
+        storage='jsonl',
+        driver=None,
+        headless=False,
+        wait_for_login=True,
+        metrics=False,
+        profile=False,
+        encoder='torch',
+        encoder_threads=None,
+        matcher=None
     ) -> None:
+        '''
+        Parameters
+        ----------
+        folder_name : str, default 'file_templates/'
+            folder containing form_answers.json, search_urls.txt and the job history
+        storage : str, default 'jsonl'
+            where job history is kept: 'jsonl' for one jsonl file per kind of record,
+            'sqlite' for a sqlite database (see SqliteStorage.import_jsonl() to bring over jsonl history)
+        driver : selenium.webdriver.Remote, default None
+            already configured selenium session to use. If None, one is started according to headless
+        headless : bool, default False
+            if True, start a new headless chrome session.
+            Otherwise start chrome with a persistent profile in folder_name and attach to it
+        wait_for_login : bool, default True
+            when starting chrome with a persistent profile, wait for [enter] so the user can log into indeed first
+        metrics : bool, default False
+            if True, append per-stage timings and counts of every autofill and scrape run to metrics.jsonl in folder_name
+        profile : bool, default False
+            if True, also save cProfile stats of every run next to metrics.jsonl (implies metrics)
+        encoder : str, default 'torch'
+            backend running the sbert model: 'torch' (sentence-transformers), 'onnx' (ONNX Runtime export of the same model)
+            or 'onnx-int8' (export with int8 weights, fastest and smallest, slightly different matches), see encoders.make_encoder()
+        encoder_threads : int, default None
+            number of threads the encoder computes with, None for the backend's default
+        matcher : str, default None
+            address of a running matching daemon (see daemon.py): a unix socket path or host:port.
+            If given, form answers and dropdown options are matched by the daemon, no model or answers are loaded by this object
+
+        The sbert model and the form answers are loaded in the background while the browser starts,
+        methods that need them wait until they are ready.
+        '''
         self.folder_name = folder_name
         self.search_url_filename = 'search_urls.txt'
         with open(self.folder_name+self.search_url_filename) as f:
             self.search_urls = f.read().split('\n')
         self.seen_jobs_filename = 'seen_jobs.jsonl'
+        self.seen_index_filename = 'seen_jobs.idx'
         self.applied_jobs_filename = 'applied_jobs.jsonl'
         self.scraped_jobs_filename = 'scraped_jobs.jsonl'
+        self.near_duplicates_filename = 'scraped_jobs.minhash'
+        self.crawl_checkpoint_filename = 'crawl_checkpoint.json'
+        self.jobs_db_filename = 'jobs.sqlite3'
+        self.metrics_filename = 'metrics.jsonl'
+        self.descriptions_filename = 'descriptions.pack'
+        self.metrics = Metrics(self.folder_name+self.metrics_filename if metrics or profile else None, profile)
+        self.blobs = BlobStore(self.folder_name+self.descriptions_filename) # every distinct job description, compressed, referenced by the job records
+        if storage == 'sqlite':
+            self.storage = SqliteStorage(self.folder_name+self.jobs_db_filename, self.blobs)
+        else:
+            self.storage = JsonlStorage(self.folder_name, {'scraped': self.scraped_jobs_filename, 'seen': self.seen_jobs_filename, 'applied': self.applied_jobs_filename}, self.blobs)
         self.recency_timedelta = datetime.timedelta(days=30)
+        self.navigator = NavigationScheduler() # paces and retries every page load, per host
+        self.max_requeues = 2 # times a page still blocked after the navigator's retries is put back at the end of the pages to scrape
+        self.seen_index = SeenIndex(self.storage, self.folder_name+self.seen_index_filename)
+        self.near_duplicate_thresh = .8 # descriptions this similar (jaccard of word shingles) are considered the same job
+        self.near_duplicates = NearDuplicateIndex(self.storage, self.folder_name+self.near_duplicates_filename, self.near_duplicate_thresh)
         self.max_context_size = 256
         self.close_context_size = 64
         self.form_element_similarity_thresh = .98
         self.element_sim_thresh = .1
         self.context_sim_thresh = .3
+        self.dense_assignment_max_keys = 256 # with more form answer keys, each element is only matched among its top candidates
+        self.answer_candidates = 16
         self.informative_input_el_attrs = {'id', 'name', 'value', 'placeholder'}
-        self.sbert = SentenceTransformer("multi-qa-mpnet-base-cos-v1")
+        self.html_parser = default_html_parser # 'lxml' when installed, 'html.parser' otherwise
+        self.sbert_model_name = "multi-qa-mpnet-base-cos-v1"
+        self.encoder_backend = encoder
+        self.encoder_threads = encoder_threads
+        self.encoder_export_folder = 'encoders/' # ONNX exports of the model, made on first use
+        self.text_emb_cache = OrderedDict() # LRU of option and answer text embeddings, kept across pages
+        self.text_emb_cache_size = 4096
+        self.profile_queries_filename = 'profile_queries.txt' # one description of a sought job per line, jobs are ranked by similarity to them
+        self.relevance_filename = 'scraped_jobs.relevance'
+        self.relevance_thresh = None # jobs whose description is less similar to every profile query are filtered out, None to only rank
+        self.relevance_index = RelevanceIndex(self.storage, self.folder_name+self.relevance_filename, encoder_name(self.encoder_backend, self.sbert_model_name))
+        self.history_filename = 'history' # columnar (parquet) mirror of the job history for analyses, see history.HistoryExport
+        self.history = HistoryExport(self.storage, self.folder_name+self.history_filename)
 
         self.form_answers_filename = 'form_answers.json'
-        self.load_answers()
-
-        # this workaround can help convince cloudflare and others that you are a real human
-        os.system('google-chrome https://www.indeed.com/ -remote-debugging-port=9014 -user-data-dir='+self.folder_name+'.chromeData &')
-        input('log into Indeed (if necessary) and press [enter] to continue: ')
-        options = webdriver.ChromeOptions()
-        options.add_experimental_option('debuggerAddress', 'localhost:9014')
-        self.driver = webdriver.Chrome(options=options)
+        self.form_key_embs_filename = 'form_answers.emb' # embeddings of form answer keys are cached on disk next to the answers
+        self.form_cache_filename = 'form_cache.json'
+        self.form_cache = FormCache(self.folder_name+self.form_cache_filename) # answers of forms already filled, replayed without the model
+        self.incremental_state = {} # controls already processed by incremental autofill on the current page
+        # controls still typed with send_keys when values are injected: autocomplete widgets only react to keystrokes,
+        # and date and time inputs parse what is typed into their own value format
+        self.keystroke_fields = ['[role=combobox]', '[aria-autocomplete]', 'input[list]', 'input[type=date]', 'input[type=datetime-local]',
+                                 'input[type=month]', 'input[type=time]', 'input[type=week]']
+        self.inject_timeout = 2. # seconds injected values have to hold before their controls are typed into instead
+        self.inject_poll = .05
+        self.matcher = RemoteMatcher(matcher) if matcher else None
+        # the model is loaded while the browser starts, answers only wait for it if some of their embeddings are not cached
+        loader = ThreadPoolExecutor(max_workers=2)
+        self.sbert_future = loader.submit(self.load_sbert) if self.matcher is None else loader.submit(lambda: None)
+        self.answers_future = loader.submit(self.load_answers) if self.matcher is None else loader.submit(lambda: None)
+        loader.shutdown(wait=False)
+
+        self.chrome_debugging_port = 9014
+        if driver is not None:
+            self.driver = driver
+        elif headless:
+            self.driver = headless_chrome()
+        else:
+            # this workaround can help convince cloudflare and others that you are a real human
+            subprocess.Popen(['google-chrome', 'https://www.indeed.com/', '-remote-debugging-port='+str(self.chrome_debugging_port), '-user-data-dir='+self.folder_name+'.chromeData'],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if wait_for_login:
+                input('log into Indeed (if necessary) and press [enter] to continue: ')
+            else:
+                self.wait_for_port(self.chrome_debugging_port)
+            options = webdriver.ChromeOptions()
+            options.add_experimental_option('debuggerAddress', 'localhost:'+str(self.chrome_debugging_port))
+            self.driver = webdriver.Chrome(options=options)
+
+    def load_sbert(self):
+        '''load the sbert model with the encoder backend chosen in the constructor'''
+        sbert = make_encoder(self.encoder_backend, self.sbert_model_name, self.folder_name+self.encoder_export_folder, self.encoder_threads)
+        self.strip_unks = UnkStripper(sbert.tokenizer) # remove characters unknown to sbert
+        return sbert
+
+    @property
+    def sbert(self):
+        '''the sbert model, waits for it to be loaded'''
+        return self.sbert_future.result()
+
+    def wait_until_ready(self):
+        '''wait for the sbert model and form answers to be loaded, raise any error that happened while loading them'''
+        self.sbert_future.result()
+        self.answers_future.result()
+
+    def wait_for_port(self, port: int, timeout=30):
+        '''wait until something listens on a local port, e.g. chrome's remote debugging port'''
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                socket.create_connection(('localhost', port), timeout=1).close()
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError('nothing listening on port '+str(port)+' after '+str(timeout)+' seconds')
+                time.sleep(.1)
 
     def load_answers(self):
-        '''reload form answers'''
+        '''reload form answers, only keys that were added or changed since the last load are encoded'''
         with open(self.folder_name+self.form_answers_filename) as f:
             self.form_keys, self.form_answers = zip(*json.load(f).items())
-            self.form_key_embs = self.sbert.encode(self.form_keys)
+        # cached form mappings are only valid for the answers and model they were matched with
+        self.form_answers_hash = hashlib.sha1(json.dumps([encoder_name(self.encoder_backend, self.sbert_model_name), self.form_keys, self.form_answers]).encode('utf-8')).hexdigest()
+        store = EmbeddingStore(self.folder_name+self.form_key_embs_filename, encoder_name(self.encoder_backend, self.sbert_model_name))
+        self.form_key_embs = store.encode(list(self.form_keys), lambda texts: self.sbert.encode(texts))
+        self.answer_index = AnswerIndex(self.form_key_embs)
 
-    def get_page(self, url: str):
+    def get_page(self, url: str, parse_only: bs4.SoupStrainer=None, expect: str=None, delay: float=None):
         '''
-        return BeautifulSoup of the page's html, obtained through selenium
+        return BeautifulSoup of the page's html, obtained through selenium when self.navigator allows it
 
         Parameters
         ----------
         url : str
             url of the page to get
+        parse_only : bs4.SoupStrainer, default None
+            if given, only the matching parts of the page are parsed, e.g. parsing.description_page_strainer
+        expect : str, default None
+            id of an element the page must have, e.g. 'jobDescriptionText'. Without it, the page is treated as a block page
+        delay : float, default None
+            if given, minimum time in seconds between two page loads from the url's host
 
         Returns
         -------
         BeautifulSoup
             BeautifulSoup of the page's html
+
+        Raises
+        ------
+        navigation.Blocked
+            if the page was a challenge or block page after every retry
         '''
-        self.driver.get(url)
-        return BeautifulSoup(self.driver.page_source, 'html.parser')
+        page_source = self.navigator.navigate(self.driver, url, expect, source=True, min_interval=delay, sleep=self.metrics.sleep)
+        return parse_html(page_source, self.html_parser, parse_only)
 
-    def get_description_urls(self, search_page: BeautifulSoup):
+    def get_description_urls(self, search_page: BeautifulSoup, base_url='https://www.indeed.com'):
         '''
         return urls to job description pages of every result of an indeed search result page
 
@@ -90,6 +318,8 @@ class AutoApply():
         ----------
         search_page : BeautifulSoup
             the indeed search results page from which to extract job description links
+        base_url : str, default 'https://www.indeed.com'
+            url the links of the search page are relative to
 
         Returns
         -------
@@ -97,7 +327,7 @@ class AutoApply():
             urls that bring you to job description pages
         '''
         titles = search_page.find_all(class_='jcs-JobTitle')
-        return ['https://www.indeed.com'+t['href'] for t in titles]
+        return [urljoin(base_url, t['href']) for t in titles]
 
     def get_description(self, description_page: BeautifulSoup):
         '''
@@ -113,7 +343,7 @@ class AutoApply():
         str
             job description text
         '''
-        return description_page.find(id='jobDescriptionText').get_text()
+        return normalize_whitespace(description_page.find(id='jobDescriptionText').get_text())
 
     def get_indeed_apply_url(self, description_page: BeautifulSoup):
         '''
@@ -135,6 +365,134 @@ class AutoApply():
             return link_container.find('button')['href']
         else: # could not find link
             return None
+
+    def get_next_page_url(self, search_page: BeautifulSoup, base_url='https://www.indeed.com'):
+        '''
+        return the url of the next page of an indeed search result page
+
+        Parameters
+        ----------
+        search_page : BeautifulSoup
+            the indeed search results page
+        base_url : str, default 'https://www.indeed.com'
+            url the links of the search page are relative to
+
+        Returns
+        -------
+        str
+            url of the next results page, None if this is the last page
+        '''
+        link = search_page.find('a', attrs={'data-testid': 'pagination-page-next'})
+        if link and link.get('href'):
+            return urljoin(base_url, link['href'])
+        return None
+
+    def load_known_urls(self):
+        '''
+        return fingerprints (see utils.url_key) of the description and apply urls of every scraped or seen job,
+        streamed from the job history without loading it
+
+        Returns
+        -------
+        set[int]
+            url fingerprints
+        '''
+        known = set()
+        for kind in ['scraped', 'seen']:
+            for job, _ in self.storage.iter_records(kind):
+                known.update(url_key(job[k]) for k in ['description_url', 'apply_url'] if job.get(k))
+        return known
+
+    def crawl_jobs(self, search_urls: list[str]=None, max_pages=5, delay=None, resume=True):
+        '''
+        follow the pages of results of a list of indeed searches, yielding each new job as soon as it is scraped.
+        Jobs are saved to self.scraped_jobs_filename as they come and the pages left to crawl to self.crawl_checkpoint_filename,
+        so an interrupted crawl picks up where it stopped, and jobs already scraped or seen are never loaded again
+
+        Parameters
+        ----------
+        search_urls : list[str], default None
+            list of indeed search urls. If None, uses self.search_urls which is loaded from self.search_url_filename
+        max_pages : int, default 5
+            maximum number of result pages to follow per search
+        delay : float, default None
+            if given, minimum time in seconds between two page loads from the same host,
+            otherwise pages are loaded as fast as self.navigator finds the site tolerates
+        resume : bool, default True
+            if True and a checkpoint exists, continue its crawl instead of starting over from search_urls
+
+        Yields
+        ------
+        dict
+            job with the same structure as the output of get_jobs()
+        '''
+        checkpoint_path = self.folder_name+self.crawl_checkpoint_filename
+        frontier = None
+        if resume and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                frontier = json.load(f)['frontier'] or None
+        if frontier is None:
+            if search_urls==None:
+                search_urls = self.search_urls
+            frontier = [[search_url, search_url, 1] for search_url in search_urls if search_url]
+
+        def save_checkpoint():
+            with open(checkpoint_path+'.tmp', 'w') as f:
+                json.dump({'frontier': frontier}, f)
+            os.replace(checkpoint_path+'.tmp', checkpoint_path)
+
+        known = self.load_known_urls()
+        save_checkpoint()
+        requeues = Counter()
+        while frontier:
+            search_url, page_url, page_number = frontier[0]
+            try:
+                search_page = self.get_page(page_url, search_page_strainer, delay=delay)
+            except Blocked as e: # try the other pages first, the checkpoint keeps it for the next crawl if it stays blocked
+                print('Warning: could not load', page_url, 'resulted in:')
+                print(e)
+                requeues[page_url] += 1
+                if requeues[page_url] > self.max_requeues:
+                    return
+                frontier.append(frontier.pop(0))
+                save_checkpoint()
+                continue
+            description_urls = deque((url, 0) for url in self.get_description_urls(search_page, page_url) if url_key(url) not in known)
+            next_page_url = self.get_next_page_url(search_page, page_url) if page_number < max_pages else None
+            del search_page
+            while description_urls:
+                url, attempts = description_urls.popleft()
+                try:
+                    description_page = self.get_page(url, description_page_strainer, 'jobDescriptionText', delay)
+                    description = self.get_description(description_page)
+                    indeed_joblink_redirect = self.get_indeed_apply_url(description_page)
+                    del description_page
+                    if not indeed_joblink_redirect: # if the link was not found, just use the indeed description page url
+                        indeed_joblink_redirect = url
+                    self.navigator.navigate(self.driver, urljoin(url, indeed_joblink_redirect), min_interval=delay, sleep=self.metrics.sleep)
+                    apply_url = self.driver.current_url
+                except Exception as e: # not marked as known, so the next crawl tries again
+                    if isinstance(e, Blocked) and attempts < self.max_requeues: # after the page's other jobs
+                        description_urls.append((url, attempts+1))
+                        continue
+                    print('Warning: could not scrape', url, 'resulted in:')
+                    print(e)
+                    continue
+                # checked before marking the description url as known, it is also the apply url of jobs without an apply link
+                duplicate = url_key(apply_url) in known # same job found through another description url
+                known.update([url_key(url), url_key(apply_url)])
+                if duplicate:
+                    continue
+
+                j = {'search_url': search_url, 'description_url': url, 'apply_url': apply_url, 'description': description, 'date_scraped': datetime.datetime.now()}
+                self.storage.append('scraped', [j])
+                yield j
+            # the page is done, move on to the next one
+            frontier.pop(0)
+            if next_page_url:
+                frontier.append([search_url, next_page_url, page_number+1])
+            save_checkpoint()
+        os.remove(checkpoint_path)
         
     def load_jobs(self):
         '''
@@ -153,10 +511,9 @@ class AutoApply():
             - search_url: str
                 the urls of the search results page in which this job was found
         '''
-        with jsonl.open(self.folder_name+self.scraped_jobs_filename) as f:
-            return [datetime_parser(e) for e in f]
+        return self.storage.load('scraped')
 
-    def get_jobs(self, search_urls: list[str]=None, delay=1):
+    def get_jobs(self, search_urls: list[str]=None, delay=None, n_sessions=1, driver_factory=headless_chrome):
         '''
         get the job description text and application portal url from the first page of search results 
         of a list of indeed searches
@@ -165,6 +522,13 @@ class AutoApply():
         ----------
         search_urls : list[str], default None
             list of indeed search urls. If None, uses self.search_urls which is loaded from self.search_url_filename
+        delay : float, default None
+            if given, minimum time in seconds between two page loads from the same host (across sessions),
+            otherwise pages are loaded as fast as self.navigator finds the site tolerates
+        n_sessions : int, default 1
+            if greater than 1, pages are loaded concurrently by a ScrapePool of that many new driver sessions instead of self.driver
+        driver_factory : callable, default headless_chrome
+            returns a new selenium driver for each session of the ScrapePool
 
         Returns
         -------
@@ -178,34 +542,63 @@ class AutoApply():
                 date of the dict's creation
             - search_url: str
                 the urls of the search results page in which this job was found
+            - description_url: str
+                the url of the indeed job description page
         '''
         
         if search_urls==None:
             search_urls = self.search_urls
-        scrape = {search_url: {'search_page': self.get_page(search_url)} for search_url in search_urls}
-        for search_url in scrape:
-            time.sleep(delay)
-            scrape[search_url]['description_page_urls'] = self.get_description_urls(scrape[search_url]['search_page'])
-            scrape[search_url]['description_pages'] = [self.get_page(url) for url in scrape[search_url]['description_page_urls']]
-
-        jobs = []
-        for search_url in scrape:
-            for page, url in zip(scrape[search_url]['description_pages'], scrape[search_url]['description_page_urls']):
-                time.sleep(delay)
-                description = self.get_description(page)
-                indeed_joblink_redirect = self.get_indeed_apply_url(page)
-                if not indeed_joblink_redirect: # if the link was not found, just use the indeed description page url
-                    indeed_joblink_redirect = url
-                self.driver.get(indeed_joblink_redirect)
-                apply_url = self.driver.current_url
-
-                j = {'search_url': search_url, 'apply_url': apply_url, 'description': description, 'date_scraped': datetime.datetime.now()}
+        with self.metrics.run('get_jobs', n_sessions=n_sessions):
+            if n_sessions > 1:
+                jobs = []
+                for j in ScrapePool(self, driver_factory, n_sessions, delay, self.html_parser, self.navigator, self.max_requeues, self.metrics.sleep).run(search_urls):
+                    jobs.append(j)
+                    self.metrics.count('jobs')
+                    # save scraped jobs as they come. don't want to repeatedly scrape the same jobs or indeed will block
+                    with self.metrics.stage('storage'):
+                        self.storage.append('scraped', [j])
+                return jobs
+
+            # (search url, page url, times requeued) of the pages left to scrape, pages still blocked after the navigator's retries go back at the end
+            tasks = deque((search_url, search_url, 0) for search_url in search_urls)
+            jobs = []
+            while tasks:
+                search_url, url, attempts = tasks.popleft()
+                try:
+                    if url == search_url:
+                        with self.metrics.stage('get_page'):
+                            search_page = self.get_page(search_url, search_page_strainer, delay=delay)
+                        tasks.extend((search_url, description_url, 0) for description_url in self.get_description_urls(search_page, search_url))
+                        self.metrics.count('webdriver_calls', 2)
+                        continue
+                    with self.metrics.stage('get_page'):
+                        page = self.get_page(url, description_page_strainer, 'jobDescriptionText', delay)
+                    with self.metrics.stage('parse_description'):
+                        description = self.get_description(page)
+                        indeed_joblink_redirect = self.get_indeed_apply_url(page)
+                    del page
+                    if not indeed_joblink_redirect: # if the link was not found, just use the indeed description page url
+                        indeed_joblink_redirect = url
+                    with self.metrics.stage('apply_redirect'):
+                        self.navigator.navigate(self.driver, urljoin(url, indeed_joblink_redirect), min_interval=delay, sleep=self.metrics.sleep)
+                        apply_url = self.driver.current_url
+                    self.metrics.count('webdriver_calls', 4)
+                except Exception as e:
+                    if isinstance(e, Blocked) and attempts < self.max_requeues:
+                        tasks.append((search_url, url, attempts+1))
+                        continue
+                    print('Warning: could not scrape', url, 'resulted in:')
+                    print(e)
+                    continue
+
+                j = {'search_url': search_url, 'description_url': url, 'apply_url': apply_url, 'description': description, 'date_scraped': datetime.datetime.now()}
                 jobs.append(j)
-                # save scraped jobs to a file. don't want to repeatedly scrape the same jobs or indeed will block
-                with jsonl.open(self.folder_name+self.scraped_jobs_filename, 'a') as f:
-                    f.write(datetime_serializer(j))
+                self.metrics.count('jobs')
+                # save scraped jobs. don't want to repeatedly scrape the same jobs or indeed will block
+                with self.metrics.stage('storage'):
+                    self.storage.append('scraped', [j])
 
-        return jobs
+            return jobs
     
     def view_jobs(self, jobs: list[dict]):
         '''
@@ -223,18 +616,23 @@ class AutoApply():
         '''
         seen = []
         for job in jobs:
-            self.driver.get(job['apply_url'])
+            try:
+                self.navigator.navigate(self.driver, job['apply_url'], sleep=self.metrics.sleep)
+            except Blocked as e: # still shown, the user may get past it
+                print('Warning:', e)
             job['date_seen'] = datetime.datetime.now()
             seen.append(job)
-            with jsonl.open(self.folder_name+self.seen_jobs_filename, 'a') as f:
-                f.write(datetime_serializer(job))
+            self.storage.append('seen', [job])
+            self.seen_index.sync()
             if input('[enter] to view next job, anything else to stop viewing'):
                 break
-        return deepcopy(seen)
+        return [copy(job) for job in seen] # descriptions are immutable, no need to copy them
 
     def filter_jobs(self, jobs: list[dict]):
         '''
-        return only the jobs that fit certain criteria: haven't been seen recently (that's it for now)
+        return only the jobs that fit certain criteria: neither they nor a near-duplicate have been seen recently,
+        and if profile_queries.txt lists profile queries, their description is similar enough to one of them (see self.relevance_thresh).
+        Jobs are then returned most relevant first, see rank_jobs()
 
         Parameters
         ----------
@@ -246,16 +644,74 @@ class AutoApply():
         list of dicts
             jobs that pass the filter       
         '''
-        # remove jobs that have been seen recently
-        with jsonl.open(self.folder_name+self.seen_jobs_filename) as f:
-            recently_seen = [datetime_parser(job) for job in f if datetime_parser(job)['date_seen'] > datetime.datetime.now() - self.recency_timedelta]
+        # remove jobs that have been seen recently, by description or apply url, and repeats within jobs
+        # a job is also identified by the fingerprints of every scraped job with a near-duplicate description (reposts, same job from several searches)
+        self.seen_index.load()
+        self.near_duplicates.threshold = self.near_duplicate_thresh
+        self.near_duplicates.load()
+        cutoff = datetime.datetime.now() - self.recency_timedelta
+        fresh_jobs, fresh_fps = [], set()
+        for job in jobs:
+            fps = job_fingerprints(job)
+            if job.get('description'):
+                near_duplicates = self.near_duplicates.query(job['description'])
+                fps += [fp for fp in near_duplicates['desc'].tolist() + near_duplicates['url'].tolist() if fp]
+            if any(fp in fresh_fps for fp in fps):
+                continue
+            last_seen = self.seen_index.get_last_seen(fps)
+            if last_seen and last_seen > cutoff:
+                continue
+            fresh_fps.update(fps)
+            fresh_jobs.append(job)
+
+        # rank jobs by relevance to the profile queries, and drop irrelevant ones
+        filtered_jobs = fresh_jobs
+        ranked = self.rank_jobs(fresh_jobs)
+        if ranked is not None:
+            filtered_jobs = [job for job, score in ranked if self.relevance_thresh is None or not score < self.relevance_thresh]
 
-        fresh_jobs = pd.DataFrame(jobs+recently_seen).drop_duplicates('description', keep=False).to_dict('records')
+        return filtered_jobs
 
-        # filter jobs based on any other requirements
-        filtered_jobs = fresh_jobs # nothing for now
+    def load_profile_queries(self):
+        '''return the profile queries of profile_queries.txt, empty if there is no such file'''
+        path = self.folder_name+self.profile_queries_filename
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [q.strip() for q in f.read().split('\n') if q.strip()]
 
-        return filtered_jobs
+    def rank_jobs(self, jobs: list[dict], queries: list[str]=None):
+        '''
+        rank jobs by the similarity of their description to the closest profile query.
+        Descriptions are embedded once and kept in self.relevance_index, so ranking jobs already scraped
+        (even the whole history, e.g. self.storage.load('scraped')) needs no model call but for the queries
+
+        Parameters
+        ----------
+        jobs : list of dicts
+            the jobs to rank, should have the structure of the output of get_jobs()
+        queries : list of str, default None
+            descriptions of the jobs sought, those of profile_queries.txt if None
+
+        Returns
+        -------
+        list of tuples or None
+            (job, similarity) pairs, most similar first, jobs without description last with a nan similarity.
+            None if there are no queries, or if matching is done by a daemon and no model is loaded here
+        '''
+        queries = self.load_profile_queries() if queries is None else queries
+        if not queries or self.matcher is not None:
+            return None
+        self.sbert_future.result()
+        encoder = lambda texts: self.sbert.encode(self.strip_unks(texts))
+        with self.metrics.run('rank_jobs', jobs=len(jobs)):
+            with self.metrics.stage('index_descriptions'):
+                self.relevance_index.load(encoder)
+                query_embs = self.encode_cached(self.strip_unks(queries))
+            with self.metrics.stage('rank'):
+                scores = self.relevance_index.scores(jobs, query_embs, encoder)
+                order = np.argsort(-np.nan_to_num(scores, nan=-np.inf), kind='stable')
+        return [(jobs[i], float(scores[i])) for i in order]
 
     def get_form_elements_html(self, form_page: BeautifulSoup):
         '''
@@ -269,14 +725,10 @@ class AutoApply():
             Returns
             -------
             list of bs4.element.Tag
-                all the bs4 form elements present in the input page
+                all the bs4 form elements present in the input page, in document order
 
         '''        
-        form_el_names = ['input', 'select', 'textarea', 'datalist',  'optgroup'] # removed 'button'
-        form_els = []
-        for el in form_el_names:
-            form_els += form_page.find_all(el)
-        return form_els
+        return form_page.find_all(form_control_names) # a single traversal for every kind of element
 
     def get_query_from_html(self, html_el: bs4.element.Tag):
         '''
@@ -339,7 +791,41 @@ class AutoApply():
         xpath = '//'+html_el.name+'[' + ' and '.join(selectors) + ']'
         return xpath
 
-    def get_surrounding_text(self, html_el: bs4.element.Tag, thresh=float):
+    def get_text_index(self, page: BeautifulSoup, blacklist=['option']):
+        '''
+        index the text of every element of a page in a single traversal, so that surrounding text lookups don't re-walk the tree
+
+            Parameters
+            ----------
+            page : BeautifulSoup
+                the bs4 page to index
+            blacklist : list[str], default ['option']
+                names of elements whose text is excluded, see get_surrounding_text()
+
+            Returns
+            -------
+            tuple[str, dict]
+                the filtered text of the whole page, and a dict mapping id() of every element to the (start, end) span of its filtered text
+        '''
+        chunks, spans, offset = [], {}, 0
+        stack = [(page, iter(page.contents), 0)]
+        while stack:
+            tag, children, start = stack[-1]
+            child = next(children, None)
+            if child is None: # all children visited, the element's text ends here
+                stack.pop()
+                spans[id(tag)] = (start, offset)
+            elif isinstance(child, bs4.element.Tag):
+                if child.name in blacklist:
+                    spans[id(child)] = (offset, offset)
+                else:
+                    stack.append((child, iter(child.contents), offset))
+            elif type(child) in (bs4.element.NavigableString, bs4.element.CData): # same strings as get_text()
+                chunks.append(child)
+                offset += len(child)
+        return ''.join(chunks), spans
+
+    def get_surrounding_text(self, html_el: bs4.element.Tag, thresh=float, text_index: tuple[str, dict]=None):
         '''
         return text of the furthest grandparent with text no greater than self.max+context_size characters
 
@@ -347,6 +833,8 @@ class AutoApply():
             ----------
             html_el : bs4.element.Tag
                 bs4 element to get the surrounding text of
+            text_index : tuple[str, dict], default None
+                output of get_text_index() for the page html_el belongs to. If None, text is extracted by walking the tree
 
             Returns
             -------
@@ -354,6 +842,16 @@ class AutoApply():
                 text of the furthest grandparent with text no greater than self.max+context_size characters
 
         '''        
+        if text_index:
+            text, spans = text_index
+            def span_len(el):
+                start, end = spans[id(el)]
+                return end - start
+            while html_el.parent is not None and span_len(html_el.parent) <= thresh:
+                html_el = html_el.parent
+            start, end = spans[id(html_el)]
+            return text[start:end]
+
         # exclude options from surrounding text: these represent an answer not the question so they will not semantically match well with the form_answer.json keys
         def get_filtered_text(el: bs4.element.Tag, blacklist=['option']):
             text = el.get_text()
@@ -368,7 +866,7 @@ class AutoApply():
 
         return get_filtered_text(html_el)
     
-    def describe_element(self, html_el: bs4.element.Tag):
+    def describe_element(self, html_el: bs4.element.Tag, text_index: tuple[str, dict]=None):
         '''
         extracts text directly surrounding the input form element, as well as useful attributes of the element that may be descriptive of it's purpose
 
@@ -376,6 +874,8 @@ class AutoApply():
             ----------
             html_el : bs4.element.Tag
                 bs4 element to describe
+            text_index : tuple[str, dict], default None
+                output of get_text_index() for the page html_el belongs to
 
             Returns
             -------
@@ -383,9 +883,9 @@ class AutoApply():
                 surrounding text + self.informative_input_el_attrs
         '''
         usefull_attrs = {k: v for k, v in html_el.attrs.items() if k in self.informative_input_el_attrs}
-        return self.get_surrounding_text(html_el, self.close_context_size) + ' ' + str(usefull_attrs)
+        return self.get_surrounding_text(html_el, self.close_context_size, text_index) + ' ' + str(usefull_attrs)
 
-    def get_form_answers(self, contexts: list[str], form_els: list[str]):
+    def get_form_answers(self, contexts: list[str], form_els: list[str], assign=True):
         '''
         semantic search pre-set form answers based on form element and it's context
 
@@ -395,6 +895,11 @@ class AutoApply():
                 list of string of context to inform the semantic search
             form_els : list[str]
                 list of string of the form element itself, also to inform the semantic search
+            assign : bool, default True
+                if True, each form element gets a different answer (linear sum assignment),
+                otherwise each form element independently gets its most similar answer.
+                With more than self.dense_assignment_max_keys answers, each element is only matched among
+                its self.answer_candidates most similar answers (see AnswerIndex.assign())
 
             Returns
             -------
@@ -402,19 +907,145 @@ class AutoApply():
                 best of the pre-set form answers to fill the form element with
 
         '''        
-        def strip_unks(strings): # remove characters unknown to sbert
-            return [''.join([c for c in s if self.sbert.tokenizer(c)['input_ids'][1] != 104]) for s in strings]
-        
-        context_embs = self.sbert.encode(strip_unks(contexts))
-        el_embs = self.sbert.encode(strip_unks(form_els))
-        co_sims, el_sims = cosine_similarity(context_embs, self.form_key_embs), cosine_similarity(el_embs, self.form_key_embs)
-        similarities = co_sims + el_sims
-        # get most similar pairs
-        answer_indexes = linear_sum_assignment(similarities, maximize=True)[1]
+        if self.matcher is not None:
+            return self.matcher.get_form_answers(contexts, form_els, assign)
+        with self.metrics.run('get_form_answers'):
+            with self.metrics.stage('wait_until_ready'):
+                self.wait_until_ready()
+            with self.metrics.stage('strip_unks'):
+                contexts, form_els = self.strip_unks(contexts), self.strip_unks(form_els)
+            with self.metrics.stage('encode'):
+                context_embs = self.sbert.encode(contexts)
+                el_embs = self.sbert.encode(form_els)
+            self.metrics.record('encode_batch_sizes', len(contexts))
+            self.metrics.record('encode_batch_sizes', len(form_els))
+            return self.match_answers(context_embs, el_embs, assign)
+
+    def match_answers(self, context_embs: np.ndarray, el_embs: np.ndarray, assign=True):
+        '''
+        return the pre-set form answers of form elements from the embeddings of their contexts and of themselves, see get_form_answers()
+
+            Parameters
+            ----------
+            context_embs : numpy.ndarray
+                one embedding row per form element context
+            el_embs : numpy.ndarray
+                one embedding row per form element string
+            assign : bool, default True
+                if True, each form element gets a different answer, otherwise each gets its most similar answer
+
+            Returns
+            -------
+            list[str]
+                answer of each form element, '' where no answer matches well enough
+        '''
+        if len(self.answer_index) > self.dense_assignment_max_keys and len(context_embs) <= len(self.answer_index):
+            # large answer bank, no dense similarity matrix or assignment
+            with self.metrics.stage('assignment'):
+                if assign:
+                    answer_indexes = self.answer_index.assign(context_embs, el_embs, self.answer_candidates)
+                else:
+                    answer_indexes = self.answer_index.best(context_embs, el_embs)
+            co_sims = self.answer_index.pair_similarities(context_embs, answer_indexes)
+            el_sims = self.answer_index.pair_similarities(el_embs, answer_indexes)
+        else:
+            with self.metrics.stage('similarities'):
+                co_sims, el_sims = cosine_similarity(context_embs, self.form_key_embs), cosine_similarity(el_embs, self.form_key_embs)
+                similarities = co_sims + el_sims
+            # get most similar pairs
+            with self.metrics.stage('assignment'):
+                if assign:
+                    from scipy.optimize import linear_sum_assignment
+                    answer_indexes = linear_sum_assignment(similarities, maximize=True)[1]
+                else:
+                    answer_indexes = similarities.argmax(axis=1)
+            co_sims = co_sims[np.arange(len(answer_indexes)), answer_indexes]
+            el_sims = el_sims[np.arange(len(answer_indexes)), answer_indexes]
         # ignore fields with bad match on context OR element
-        to_ignore = [co_sims[i, answer_indexes[i]] < self.context_sim_thresh or el_sims[i, answer_indexes[i]] < self.element_sim_thresh for i in range(len(answer_indexes))] 
+        to_ignore = [co_sims[i] < self.context_sim_thresh or el_sims[i] < self.element_sim_thresh for i in range(len(answer_indexes))] 
         return [self.form_answers[k] if not to_ignore[i] else '' for i, k in enumerate(answer_indexes)]
 
+    def encode_cached(self, texts: list[str]):
+        '''
+        return sbert embeddings of texts, using self.text_emb_cache and encoding all cache misses in a single call
+
+            Parameters
+            ----------
+            texts : list[str]
+                texts to embed
+
+            Returns
+            -------
+            numpy.ndarray
+                one embedding row per text
+        '''
+        missing = [t for t in dict.fromkeys(texts) if t not in self.text_emb_cache]
+        if missing:
+            with self.metrics.stage('encode'):
+                self.text_emb_cache.update(zip(missing, self.sbert.encode(missing)))
+            self.metrics.record('encode_batch_sizes', len(missing))
+        for t in texts:
+            self.text_emb_cache.move_to_end(t)
+        embs = np.array([self.text_emb_cache[t] for t in texts])
+        while len(self.text_emb_cache) > self.text_emb_cache_size:
+            self.text_emb_cache.popitem(last=False)
+        return embs
+
+    def get_best_options(self, options_list: list[list[bs4.element.Tag]], contexts: list[str], form_els: list[str]):
+        '''
+        semantic search pre-set form answers for several dropdowns at once, with one batch of model calls for all of them
+
+            Parameters
+            ----------
+            options_list : list[list[bs4.element.Tag]]
+                for each dropdown, list of options to choose from
+            contexts : list[str]
+                for each dropdown, string of context to inform the semantic search
+            form_els : list[str]
+                for each dropdown, string of the form element itself, also to inform the semantic search
+
+            Returns
+            -------
+            list[bs4.element.Tag]
+                closest matching option found for each dropdown
+        '''
+        if not options_list:
+            return []
+        option_texts = [[e.get_text() for e in options] for options in options_list]
+        if self.matcher is not None:
+            indexes = self.matcher.get_best_options(option_texts, contexts, form_els)
+        else:
+            # each dropdown is matched independently, the same as calling get_best_option() on each
+            answers = self.get_form_answers(contexts, form_els, assign=False)
+            indexes = self.best_option_indexes(answers, option_texts)
+        return [options[i] for options, i in zip(options_list, indexes)]
+
+    def best_option_indexes(self, answers: list[str], option_texts: list[list[str]]):
+        '''
+        return the index of the option closest to the answer of each dropdown
+
+            Parameters
+            ----------
+            answers : list[str]
+                answer of each dropdown, see get_form_answers()
+            option_texts : list[list[str]]
+                for each dropdown, text of its options
+
+            Returns
+            -------
+            list[int]
+                index of the closest option of each dropdown
+        '''
+        # answers and options embedded together: one model call at most, none once the texts are cached
+        embs = self.encode_cached(answers + [t for texts in option_texts for t in texts])
+        ans_embs, option_embs = embs[:len(answers)], embs[len(answers):]
+        indexes, start = [], 0
+        for texts, ans_emb in zip(option_texts, ans_embs):
+            sims = cosine_similarity([ans_emb], option_embs[start:start+len(texts)])
+            start += len(texts)
+            indexes.append(int(sims.argmax()))
+        return indexes
+
     def get_best_option(self, options: list[bs4.element.Tag], context: str, form_el: str):
         '''
         semantic search pre-set form answers based on form element and it's context
@@ -434,14 +1065,7 @@ class AutoApply():
                 closest matching option found
 
         '''        
-        # get answer to context and form el
-        ans = self.get_form_answers([context], [form_el])[0]
-        # find option closely matching answer
-        option_embs = self.sbert.encode([e.get_text() for e in options])
-        sims = cosine_similarity(self.sbert.encode([ans]), option_embs)
-        best_opt_i = sims.argmax()
-
-        return options[best_opt_i]
+        return self.get_best_options([options], [context], [form_el])[0]
 
 
     def get_duplicate_element_indexes(self, elements: list[bs4.element.Tag]):
@@ -459,17 +1083,134 @@ class AutoApply():
                 lists of duplicate's indexes, each list contains indexes of identical elements
 
         '''        
-        el_attrs_list = [frozenset((a, tuple(v) if type(v)==list else v) for a, v in el.attrs.items()) for el in elements]
+        el_attrs_list = [self.get_element_attrs(el) for el in elements]
         return [[i for i, el in enumerate(el_attrs_list) if el == d] for d, c in Counter(el_attrs_list).items() if c>1]
 
-    def autofill_current_page(self, delay=.1):
-        '''fill any form elements on the driver's active page with preset answers'''
+    def get_element_attrs(self, html_el: bs4.element.Tag):
+        '''return the attributes of an element as a hashable set, elements with the same attributes are considered duplicates'''
+        return frozenset((a, tuple(v) if type(v)==list else v) for a, v in html_el.attrs.items() if a != snapshot_id_attr)
+
+    def get_form_html(self, selectors: list[str]=form_control_names):
+        '''
+        return the html of the smallest part of the driver's active page holding every form control and the text surrounding them,
+        which on large single page application portals is much less to transfer and parse than the whole page
+
+            Parameters
+            ----------
+            selectors : list[str], default parsing.form_control_names
+                css selectors of the controls the subtree must hold
+
+            Returns
+            -------
+            str
+                html of the form subtree, the whole page's html if it has no matching controls
+        '''
+        return self.driver.execute_script(form_root_js, self.max_context_size, selectors) or self.driver.page_source
+
+    def snapshot_form_controls(self):
+        '''
+        tag every form control on the driver's active page with a stable id, and collect their state in a single script call
+
+            Returns
+            -------
+            dict
+                maps each control's snapshot_id_attr value to a dict with:
+                - element: selenium WebElement
+                - displayed: bool
+                - enabled: bool
+                - value: str or None
+                    current value of the control
+                - options: list[str]
+                    ids of the options of a select, empty for other controls
+        '''
+        return {c['id']: c for c in self.driver.execute_script(snapshot_js, snapshot_id_attr)}
+
+    def can_inject(self, html_el: bs4.element.Tag):
+        '''
+        return True if the value of html_el can be set with inject_values(): text inputs, textareas and options of selects,
+        unless they (or their select) match one of self.keystroke_fields and must be typed into
+        '''
+        if html_el.name == 'option':
+            html_el = html_el.find_parent('select')
+        elif not (html_el.name == 'textarea' or (html_el.name == 'input' and html_el.get('type', 'text') in text_types)):
+            return False
+        return html_el is not None and not any(html_el.css.match(selector) for selector in self.keystroke_fields)
+
+    def inject_values(self, entries: list[tuple]):
+        '''
+        set the values of many controls of the driver's active page with one script call per check, firing the events of user input.
+        Values are set again until a check finds every one of them still set, for forms that re-render or reset controls,
+        for up to self.inject_timeout seconds
+
+            Parameters
+            ----------
+            entries : list[tuple]
+                (selenium WebElement, value) pairs, (option WebElement, None) to select an option
+
+            Returns
+            -------
+            list[tuple]
+                entries whose value was rejected or did not hold, detached elements excluded
+        '''
+        pending = [[el, value, None] for el, value in entries] # with the value read back after it was first set
+        failed = []
+        deadline = time.monotonic() + self.inject_timeout
+        while pending:
+            # the first call sets every value, the following ones only those the page reset since
+            changed, values, detached, rejected = self.driver.execute_script(inject_js, pending)
+            self.metrics.count('webdriver_calls')
+            if detached:
+                print('Warning:', len(detached), 'controls were removed from the page before their value was set')
+            failed += [pending[i] for i in rejected]
+            for i, value in zip(changed, values):
+                if pending[i][2] is None:
+                    pending[i][2] = value
+            pending = [pending[i] for i in changed]
+            if time.monotonic() >= deadline: # values still being reset never settled
+                failed += pending
+                break
+            if pending:
+                self.metrics.sleep(self.inject_poll)
+        return [(el, value) for el, value, _ in failed]
+
+    def autofill_current_page(self, delay=.1, snapshot=False, incremental=False, inject=False):
+        '''
+        fill any form elements on the driver's active page with preset answers
+
+            Parameters
+            ----------
+            delay : float, default .1
+                time in seconds to wait before each input
+            snapshot : bool, default False
+                if True, get every control's state with one snapshot_form_controls() call and act on its ids,
+                instead of finding each element through xpath with several webdriver calls
+            incremental : bool, default False
+                if True, only extract and match the controls that previous incremental calls on the same page did not process,
+                or whose visibility, enabled state or options changed since: for multi-step and dynamically revealed forms. Implies snapshot
+            inject : bool, default False
+                if True, set every answer and dropdown choice with inject_values() at the end, firing the events of user input,
+                instead of typing and clicking them one by one after delay: long answers take no longer than short ones.
+                Other controls, those matching self.keystroke_fields and those whose injected value did not hold are still typed into. Implies snapshot
+
+        The answers given to a form are stored in self.form_cache. When a structurally identical form is filled again
+        (e.g. another job on the same portal software) they are replayed, only the controls they don't cover are matched with the model.
+        Not used with a matching daemon, whose answers are not known here
+        '''
         def try_find_element(el: bs4.element.Tag):
+            if snapshot:
+                control = controls.get(el.get(snapshot_id_attr))
+                return [control['element']] if control else []
+            self.metrics.count('webdriver_calls')
+            with self.metrics.stage('find_element'):
+                return find_element(el)
+
+        def find_element(el: bs4.element.Tag):
             # first try to get by ID only
             if 'id' in el.attrs:
                 drels = self.driver.find_elements(By.ID, el['id'])
                 if len(drels) == 1:
                     return drels
+                self.metrics.count('webdriver_calls')
             # if it's an option, we need to specify the parent and text value
             if el.name == 'option':
                 try:
@@ -497,20 +1238,42 @@ class AutoApply():
         def fill_text(text_els: list[bs4.element.Tag]):
             # deal with duplicates
             dupe_idxs = self.get_duplicate_element_indexes(text_els)
+            # and with duplicates of elements processed by previous incremental calls: the snapshot ids of the controls
+            # of each set of attributes, in the order they were first processed. A control processed again keeps its place
+            el_attrs = [self.get_element_attrs(el) for el in text_els]
+            prior = self.incremental_state['element_attrs'] if incremental else {}
+            if incremental:
+                for el, attrs in zip(text_els, el_attrs):
+                    ids = prior.setdefault(attrs, [])
+                    if el[snapshot_id_attr] not in ids:
+                        ids.append(el[snapshot_id_attr])
+            # answers replayed from the form cache, the others are matched
+            form_answers = [cached_answer('text', el) for el in text_els]
+            to_match = [idx for idx, answer in enumerate(form_answers) if answer is None]
             # map elements to answers
             # make queries
-            el_strings = []
-            for idx, el in enumerate(text_els):
-                if any(idx in dis for dis in dupe_idxs):
-                    i = [dis.index(idx) for dis in dupe_idxs if idx in dis][0] # el is the i'th duplicate
-                    # enrich query with position
-                    el_str = places[i]+' '+self.describe_element(el)
-                else:
-                    el_str = self.describe_element(el)
-                el_strings.append(el_str)
-                contexts = [self.get_surrounding_text(el, self.max_context_size) for el in text_els]
-
-            form_answers = self.get_form_answers(contexts, el_strings)
+            with self.metrics.stage('surrounding_text'):
+                el_strings = []
+                for idx in to_match:
+                    el = text_els[idx]
+                    if incremental:
+                        ids = prior[el_attrs[idx]]
+                        i = ids.index(el[snapshot_id_attr]) if len(ids) > 1 else None
+                    else:
+                        i = ([dis.index(idx) for dis in dupe_idxs if idx in dis] or [None])[0]
+                    if i is not None: # el is the i'th duplicate
+                        # enrich query with position
+                        el_str = places[min(i, len(places)-1)]+' '+self.describe_element(el, text_index)
+                    else:
+                        el_str = self.describe_element(el, text_index)
+                    el_strings.append(el_str)
+                contexts = [self.get_surrounding_text(text_els[idx], self.max_context_size, text_index) for idx in to_match]
+
+            if to_match:
+                for idx, answer in zip(to_match, self.get_form_answers(contexts, el_strings)):
+                    form_answers[idx] = answer
+            for el, answer in zip(text_els, form_answers):
+                mapping['text:'+el_keys[id(el)]] = answer
             # input answers
             for idx in range(len(text_els)):
                 if any(idx in dis for dis in dupe_idxs):
@@ -520,53 +1283,205 @@ class AutoApply():
                 el = text_els[idx]
                 to_input = form_answers[idx]
                 driver_els = try_find_element(el) # might not find anything and return []
-                if driver_els and not driver_els[i].get_attribute('value'): # only input if no text already input
-                    time.sleep(delay)
-                    driver_els[i].send_keys(to_input)
-
-
-
-        form_page = BeautifulSoup(self.driver.page_source, 'html.parser')
-        all_form_els = self.get_form_elements_html(form_page)
-        # remove fake elements the user can't see or use
-        # form_els = [ el for el in form_els if all(d_el.is_displayed() and d_el.is_enabled() for d_el in self.driver.find_elements(By.XPATH, self.get_xpath_from_html(el)))]
-        filtered_form_els = []
-        for el in all_form_els:
-            if all(d_el.is_displayed() and d_el.is_enabled() for d_el in try_find_element(el)):
-                filtered_form_els.append(el)
-
-
-        # handle dropdown selection
-        click_form_els = [el for el in filtered_form_els if any(subel.name=='option' for subel in el.children)]
-        for el in click_form_els:
-            options = [e for e in el.children if e.name=='option']
-            opt = self.get_best_option(options, self.get_surrounding_text(el, self.max_context_size), self.describe_element(el))
-            driver_els = try_find_element(opt)
-            for drel in driver_els:
-                time.sleep(delay)
-                drel.click()
-
-
-        # handle text answers
-        form_els = [el for el in filtered_form_els if (el.name == 'input' and ('type' in el.attrs) and any(t in el['type'] for t in text_types)) or el.name == 'textarea']
-        if form_els:
-            fill_text(form_els)
-
-
-        # handle other inputs of unknown purpose
-        other_els = [el for el in filtered_form_els if el not in form_els]
-        if other_els:
-            try:
-                fill_text(other_els)
-            except Exception as e:
-                print('Warning: filling unknown inputs resulted in:')
-                print(e)
-
+                if snapshot: # the snapshot id already singles out the duplicate
+                    i = 0
+                if driver_els and not current_value(el, driver_els[i]): # only input if no text already input
+                    if inject and self.can_inject(el):
+                        injections.append((driver_els[i], to_input))
+                        continue
+                    self.metrics.sleep(delay)
+                    with self.metrics.stage('send_keys'):
+                        driver_els[i].send_keys(to_input)
+                    self.metrics.count('webdriver_calls')
+
+        def cached_answer(kind: str, el: bs4.element.Tag):
+            return cached.get(kind+':'+el_keys[id(el)]) if cached else None
+
+        def current_value(el: bs4.element.Tag, driver_el):
+            if snapshot:
+                return controls[el[snapshot_id_attr]]['value']
+            self.metrics.count('webdriver_calls')
+            return driver_el.get_attribute('value')
+
+        def is_usable(el: bs4.element.Tag):
+            if snapshot:
+                control = controls.get(el.get(snapshot_id_attr))
+                return control is None or (control['displayed'] and control['enabled'])
+            d_els = try_find_element(el)
+            self.metrics.count('webdriver_calls', 2*len(d_els))
+            return all(d_el.is_displayed() and d_el.is_enabled() for d_el in d_els)
+
+
+
+        if incremental or inject:
+            snapshot = True
+        injections = [] # (driver element, answer) pairs set at the end in inject mode
+        with self.metrics.run('autofill_current_page', snapshot=snapshot, incremental=incremental, inject=inject):
+            if incremental: # a new document starts over
+                page_token, _ = self.driver.execute_script(watch_js)
+                if self.incremental_state.get('page') != page_token:
+                    self.incremental_state = {'page': page_token, 'processed': {}, 'element_attrs': {}}
+            if snapshot: # tags the page's controls, so must happen before reading page_source
+                with self.metrics.stage('snapshot'):
+                    controls = self.snapshot_form_controls()
+                self.metrics.count('webdriver_calls')
+            selectors = form_control_names
+            if incremental:
+                processed = self.incremental_state['processed']
+                delta = set()
+                for cid, control in controls.items():
+                    signature = (control['displayed'], control['enabled'], tuple(control['options']))
+                    if control['tag'] in form_control_names and processed.get(cid) != signature:
+                        delta.add(cid)
+                        processed[cid] = signature
+                self.metrics.count('new_or_changed_controls', len(delta))
+                if not delta:
+                    return
+                selectors = ['['+snapshot_id_attr+'="'+cid+'"]' for cid in delta]
+            with self.metrics.stage('parse_page'):
+                form_page = parse_html(self.get_form_html(selectors), self.html_parser)
+                text_index = self.get_text_index(form_page)
+                all_form_els = self.get_form_elements_html(form_page)
+                if incremental:
+                    all_form_els = [el for el in all_form_els if el.get(snapshot_id_attr) in delta]
+            self.metrics.count('webdriver_calls')
+            self.metrics.count('form_elements', len(all_form_els))
+            # remove fake elements the user can't see or use
+            # form_els = [ el for el in form_els if all(d_el.is_displayed() and d_el.is_enabled() for d_el in self.driver.find_elements(By.XPATH, self.get_xpath_from_html(el)))]
+            with self.metrics.stage('visibility_filter'):
+                filtered_form_els = []
+                for el in all_form_els:
+                    if is_usable(el):
+                        filtered_form_els.append(el)
+            self.metrics.count('usable_form_elements', len(filtered_form_els))
+
+            # look the form up in the cache of forms already filled
+            # mappings are only replayed for the answers and model they were matched with, which a remote matcher doesn't tell
+            answers_hash = getattr(self.matcher, 'form_answers_hash', None) if self.matcher is not None else None
+            use_cache = self.matcher is None or answers_hash is not None
+            cached, mapping = None, {}
+            with self.metrics.stage('form_cache'):
+                keys = self.form_cache.element_keys(filtered_form_els, [self.get_surrounding_text(el, self.close_context_size, text_index) for el in filtered_form_els])
+                el_keys = {id(el): key for el, key in zip(filtered_form_els, keys)}
+                if use_cache:
+                    if self.matcher is None:
+                        self.answers_future.result() # the model is not needed if every answer is cached
+                        answers_hash = self.form_answers_hash
+                    form_key = self.form_cache.form_key(keys, answers_hash)
+                    cached = self.form_cache.get(form_key)
+            self.metrics.count('form_cache_hits' if cached else 'form_cache_misses')
+
+
+            # handle dropdown selection
+            with self.metrics.stage('dropdowns'):
+                click_form_els = [el for el in filtered_form_els if any(subel.name=='option' for subel in el.children)]
+                self.metrics.count('dropdowns', len(click_form_els))
+                best_options = {}
+                for el in click_form_els: # replay cached choices whose option is still there
+                    option = cached_answer('option', el)
+                    matching = [e for e in el.children if e.name=='option' and e.get_text() == option]
+                    if matching:
+                        best_options[id(el)] = matching[0]
+                to_match = [el for el in click_form_els if id(el) not in best_options]
+                with self.metrics.stage('surrounding_text'):
+                    dropdown_contexts = [self.get_surrounding_text(el, self.max_context_size, text_index) for el in to_match]
+                    dropdown_strings = [self.describe_element(el, text_index) for el in to_match]
+                matched_options = self.get_best_options(
+                    [[e for e in el.children if e.name=='option'] for el in to_match],
+                    dropdown_contexts,
+                    dropdown_strings
+                )
+                best_options.update(zip(map(id, to_match), matched_options))
+                best_options = [best_options[id(el)] for el in click_form_els]
+                for el, opt in zip(click_form_els, best_options):
+                    mapping['option:'+el_keys[id(el)]] = opt.get_text()
+                for opt in best_options:
+                    driver_els = try_find_element(opt)
+                    for drel in driver_els:
+                        if inject and self.can_inject(opt):
+                            injections.append((drel, None))
+                            continue
+                        self.metrics.sleep(delay)
+                        with self.metrics.stage('click'):
+                            drel.click()
+                        self.metrics.count('webdriver_calls')
+
+
+            # handle text answers
+            form_els = [el for el in filtered_form_els if (el.name == 'input' and ('type' in el.attrs) and any(t in el['type'] for t in text_types)) or el.name == 'textarea']
+            self.metrics.count('text_elements', len(form_els))
+            if form_els:
+                with self.metrics.stage('fill_text'):
+                    fill_text(form_els)
+
+
+            # handle other inputs of unknown purpose
+            other_els = [el for el in filtered_form_els if el not in form_els]
+            self.metrics.count('other_elements', len(other_els))
+            if other_els:
+                try:
+                    with self.metrics.stage('fill_text'):
+                        fill_text(other_els)
+                except Exception as e:
+                    print('Warning: filling unknown inputs resulted in:')
+                    print(e)
+
+            if injections:
+                with self.metrics.stage('inject'):
+                    failed = self.inject_values(injections)
+                    self.metrics.count('injected_values', len(injections) - len(failed))
+                    for drel, to_input in failed: # typed and clicked instead
+                        print('Warning: injected value did not hold, typing it instead:', to_input)
+                        if to_input is None:
+                            drel.click()
+                        else:
+                            drel.clear()
+                            drel.send_keys(to_input)
+                        self.metrics.count('webdriver_calls', 1 if to_input is None else 2)
+
+            if use_cache and mapping != cached:
+                with self.metrics.stage('form_cache'):
+                    self.form_cache.put(form_key, mapping)
+
+
+
+    def autofill_on_change(self, delay=.1, interval=.5, settle=.5, timeout=600, stop=None, inject=False):
+        '''
+        fill the driver's active page, then fill the controls revealed or added as the page changes (e.g. the steps of a wizard),
+        with incremental autofill_current_page() calls
 
+            Parameters
+            ----------
+            delay : float, default .1
+                time in seconds to wait before each input
+            interval : float, default .5
+                time in seconds between checks for page changes
+            settle : float, default .5
+                time in seconds without changes after which a changed page is filled
+            timeout : float, default 600
+                time in seconds after which to stop watching
+            stop : callable, default None
+                called between checks, stops watching when it returns True
+            inject : bool, default False
+                if True, inject values instead of typing them, see autofill_current_page()
+        '''
+        self.autofill_current_page(delay, incremental=True, inject=inject)
+        page_token, mutations = self.driver.execute_script(watch_js)
+        deadline = time.monotonic() + timeout
+        changed_at = None
+        while time.monotonic() < deadline and not (stop and stop()):
+            time.sleep(interval)
+            token, count = self.driver.execute_script(watch_js)
+            if (token, count) != (page_token, mutations):
+                page_token, mutations, changed_at = token, count, time.monotonic()
+            elif changed_at is not None and time.monotonic() - changed_at >= settle:
+                self.autofill_current_page(delay, incremental=True, inject=inject)
+                page_token, mutations = self.driver.execute_script(watch_js) # changes made while filling are not new
+                changed_at = None
 
     def log_applied(self, jobs: list[dict]):
         '''
-        Save jobs to self.folder_name+self.applied_jobs_filename
+        Save jobs to self.storage as applied
 
             Parameters
             ----------
@@ -581,34 +1496,42 @@ class AutoApply():
 
         for job in jobs:
             job['date_applied'] = datetime.datetime.now()
-        with jsonl.open(self.folder_name+self.applied_jobs_filename, 'a') as f:
-            f.write_all([datetime_serializer(j) for j in jobs])
+        self.storage.append('applied', jobs)
 
     def close(self):
         '''close selenium driver'''
         self.driver.close()
 
-    def scrape_job(self, url, delay=1):
+    def scrape_job(self, url, delay=None):
         '''
-        Save job page info to self.folder_name+self.scraped_jobs_filename
+        Save job page info to self.storage as scraped
 
             Parameters
             ----------
             url : str
                 url of the page to scrape
-            delay : float
-                time in seconds to wait before repeat call
+            delay : float, default None
+                if given, minimum time in seconds between two page loads from the url's host
 
             Returns
             -------
             job: dict
-
+                None if the page was still a challenge or block page after the navigator's retries
         '''  
 
-        time.sleep(delay)
-        self.driver.get(url)
-        j = {'search_url': None, 'apply_url': self.driver.current_url, 'description': BeautifulSoup(self.driver.page_source, 'html.parser').get_text(), 'date_scraped': datetime.datetime.now()}
-        # save scraped jobs to a file. don't want to repeatedly scrape the same jobs or indeed will block
-        with jsonl.open(self.folder_name+self.scraped_jobs_filename, 'a') as f:
-            f.write(datetime_serializer(j))
+        with self.metrics.run('scrape_job'):
+            with self.metrics.stage('get_page'):
+                try:
+                    page_source = self.navigator.navigate(self.driver, url, source=True, min_interval=delay, sleep=self.metrics.sleep)
+                except Blocked as e:
+                    print('Warning: could not scrape', url, 'resulted in:')
+                    print(e)
+                    return None
+            with self.metrics.stage('parse_page'):
+                description = page_text(parse_html(page_source, self.html_parser))
+            self.metrics.count('webdriver_calls', 3)
+            j = {'search_url': None, 'apply_url': self.driver.current_url, 'description': description, 'date_scraped': datetime.datetime.now()}
+            # save scraped jobs. don't want to repeatedly scrape the same jobs or indeed will block
+            with self.metrics.stage('storage'):
+                self.storage.append('scraped', [j])
         return j
\ No newline at end of file
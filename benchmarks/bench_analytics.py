@@ -0,0 +1,85 @@
+'''
+compare weekly and per ATS counts and the scraped -> seen -> applied funnel over a synthetic job history,
+computed by re-reading the jsonl files as before, and by the columnar HistoryExport: first export, incremental sync, queries
+
+run from the repository root with: python -m benchmarks.bench_analytics [--jobs 300000]
+'''
+import argparse
+import datetime
+import random
+import tempfile
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+import jsonlines as jsonl
+
+from history import HistoryExport, ats_domain
+from storage import JsonlStorage
+from utils import datetime_parser
+
+
+hosts = ['acme.wd5.myworkdayjobs.com', 'boards.greenhouse.io', 'jobs.lever.co', 'careers.smartrecruiters.com', 'www.indeed.com']
+
+
+def make_jobs(rng: random.Random, n: int, start=0):
+    jobs = []
+    for i in range(start, start+n):
+        scraped = datetime.datetime(2025, 1, 1) + datetime.timedelta(days=rng.randint(0, 364))
+        jobs.append({'search_url': f'https://www.indeed.com/jobs?q=search{i%20}', 'apply_url': f'https://{rng.choice(hosts)}/job/{i}',
+                     'description': f'job {i} description', 'date_scraped': scraped})
+    return jobs
+
+
+def reparse_stats(paths: dict):
+    '''the stats computed the way vis.ipynb reads the history'''
+    history = {}
+    for kind, path in paths.items():
+        with jsonl.open(path) as f:
+            history[kind] = [datetime_parser(job) for job in f]
+    weekly = Counter((job['date_applied'] - datetime.timedelta(days=job['date_applied'].weekday())) for job in history['applied'])
+    per_ats = Counter(ats_domain(urlparse(job['apply_url']).netloc) for job in history['scraped'])
+    seen = {job['apply_url'] for job in history['seen']}
+    funnel = {'scraped': len({job['apply_url'] for job in history['scraped']}), 'seen': len(seen),
+              'applied': len({job['apply_url'] for job in history['applied']} & seen)}
+    return weekly, per_ats, funnel
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=300000, help='scraped jobs, a third are seen and a tenth of those applied to')
+    parser.add_argument('--new', type=int, default=1000, help='jobs scraped before the incremental sync')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as folder:
+        folder += '/'
+        storage = JsonlStorage(folder, {'scraped': 'scraped_jobs.jsonl', 'seen': 'seen_jobs.jsonl', 'applied': 'applied_jobs.jsonl'})
+        scraped = make_jobs(rng, args.jobs)
+        seen = [dict(job, date_seen=job['date_scraped'] + datetime.timedelta(days=1)) for job in scraped[::3]]
+        applied = [dict(job, date_applied=job['date_seen']) for job in seen[::10]]
+        for kind, jobs in [('scraped', scraped), ('seen', seen), ('applied', applied)]:
+            storage.append(kind, jobs)
+
+        t = time.perf_counter()
+        weekly, per_ats, funnel = reparse_stats(storage.paths)
+        print(f're-parsing the jsonl files: {time.perf_counter() - t:.2f} s, funnel {funnel}')
+
+        history = HistoryExport(storage, folder+'history')
+        t = time.perf_counter()
+        history.sync()
+        print(f'first export of {len(scraped) + len(seen) + len(applied)} records: {time.perf_counter() - t:.2f} s')
+        storage.append('scraped', make_jobs(rng, args.new, args.jobs))
+        t = time.perf_counter()
+        history = HistoryExport(storage, folder+'history') # as in a new session, parts are read back from disk
+        history.sync()
+        print(f'loading the export and syncing {args.new} new records: {time.perf_counter() - t:.2f} s')
+
+        t = time.perf_counter()
+        history_weekly = history.counts('applied', period='week')
+        history_per_ats = history.counts('scraped', by=['ats_domain'])
+        history_funnel = history.funnel()
+        print(f'weekly applications, jobs per ATS and funnel: {time.perf_counter() - t:.3f} s, funnel {history_funnel}')
+        assert dict(zip(history_weekly['period'].to_pylist(), history_weekly['count'].to_pylist())) == weekly
+        assert history_funnel['seen'] == funnel['seen'] and history_funnel['applied'] == funnel['applied']
+        assert sum(history_per_ats['count'].to_pylist()) == sum(per_ats.values()) + args.new
@@ -0,0 +1,55 @@
+'''
+time preparing a list of applications with ApplyQueue for growing numbers of headless sessions, against the synthetic portals of
+benchmarks/form_fixtures.py served with a simulated network latency. Every page is accepted as soon as it is ready,
+so the time per application is what a reviewer waits between two pages
+
+run from the repository root with: python -m benchmarks.bench_apply_queue [--jobs 12] [--sessions 1 2 4] [--latency .5] [--inject]
+'''
+import argparse
+import shutil
+import time
+
+from auto_apply import AutoApply
+from apply_queue import ApplyQueue
+from daemon import NoBrowser
+from scraper import headless_chrome
+from benchmarks.bench_autofill import make_folder, read_values_js, score
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.form_fixtures import make_corpus
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=12, help='applications per run, cycling through the fixture portals')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4], help='numbers of browser sessions to compare')
+    parser.add_argument('--latency', type=float, default=.5, help='seconds the fixture server waits before every response')
+    parser.add_argument('--inject', action='store_true', help='set the values of each page in bulk instead of typing them')
+    parser.add_argument('--folder', help='folder containing the form_answers.json to use, the fictional applicant\'s by default')
+    args = parser.parse_args()
+
+    corpus = make_corpus()
+    # a distinct url per job, every portal served under many paths
+    pages = {f'/job{i}{path}': html for i in range(args.jobs) for path, html in corpus.items()}
+    paths = list(corpus)
+    folder = make_folder(args.folder)
+    app = AutoApply(folder, driver=NoBrowser()) # sessions have their own browsers
+    app.wait_until_ready() # model loading is not part of the timings
+    try:
+        with FixtureServer(pages, args.latency) as server:
+            jobs = [{'title': str(i), 'company': 'fixture', 'description': '', 'url': server.url(f'/job{i}{paths[i % len(paths)]}'),
+                     'apply_url': server.url(f'/job{i}{paths[i % len(paths)]}')} for i in range(args.jobs)]
+            for n_sessions in args.sessions:
+                queue = ApplyQueue(app, headless_chrome, n_sessions, inject=args.inject)
+                t = time.perf_counter()
+                filled = errors = 0
+                for application in queue.run([dict(job) for job in jobs]):
+                    if application.error:
+                        errors += 1
+                    else:
+                        filled += score(application.driver.execute_script(read_values_js))['filled']
+                elapsed = time.perf_counter() - t
+                print(f'{n_sessions} sessions: {elapsed:.2f} s for {len(jobs)} applications ({elapsed/len(jobs):.2f} s each), '
+                      f'{filled} controls filled, {errors} errors')
+    finally:
+        app.close()
+        shutil.rmtree(folder, ignore_errors=True)
@@ -0,0 +1,52 @@
+'''
+time matching the elements of a page to answer banks of growing size: dense similarities and linear_sum_assignment (the small bank path of
+get_form_answers) against AnswerIndex top-k pruning and sparse matching, and count how often both give an element the same key.
+Keys are random embeddings, element embeddings are noisy copies of distinct keys like the descriptions of a page's fields
+
+run from the repository root with: python -m benchmarks.bench_assignment [--elements 200] [--keys 40 1000 5000 20000]
+'''
+import argparse
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+import scipy.sparse.csgraph # imported by AnswerIndex.assign(), imported here so its first timing doesn't include it
+
+from answer_index import AnswerIndex
+from utils import cosine_similarity
+
+
+def make_bank(n_keys: int, n_elements: int, dim=768, noise=.9, seed=0):
+    rng = np.random.default_rng(seed)
+    key_embs = rng.standard_normal((n_keys, dim)).astype(np.float32)
+    targets = rng.choice(n_keys, n_elements, replace=False)
+    def noisy():
+        return key_embs[targets] + noise * rng.standard_normal((n_elements, dim)).astype(np.float32) * np.linalg.norm(key_embs[targets], axis=1, keepdims=True) / np.sqrt(dim)
+    return key_embs, noisy(), noisy()
+
+
+def dense(key_embs, context_embs, el_embs):
+    similarities = cosine_similarity(context_embs, key_embs) + cosine_similarity(el_embs, key_embs)
+    return linear_sum_assignment(similarities, maximize=True)[1]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--elements', type=int, default=200, help='form elements per page')
+    parser.add_argument('--keys', type=int, nargs='+', default=[40, 1000, 5000, 20000], help='answer bank sizes')
+    parser.add_argument('--candidates', type=int, default=16, help='top k keys kept per element')
+    parser.add_argument('--noise', type=float, default=.9, help='how far element embeddings are from their key, relative to the key norm')
+    args = parser.parse_args()
+
+    for n_keys in args.keys:
+        n_elements = min(args.elements, n_keys)
+        key_embs, context_embs, el_embs = make_bank(n_keys, n_elements, noise=args.noise)
+        t = time.perf_counter()
+        dense_indexes = dense(key_embs, context_embs, el_embs)
+        t_dense = time.perf_counter() - t
+        index = AnswerIndex(key_embs) # built once per answers load, not per page
+        t = time.perf_counter()
+        sparse_indexes = index.assign(context_embs, el_embs, args.candidates)
+        t_sparse = time.perf_counter() - t
+        print(f'{n_keys} keys, {n_elements} elements: dense {t_dense*1000:.0f} ms, top-{args.candidates} sparse {t_sparse*1000:.0f} ms '
+              f'({t_dense/t_sparse:.1f}x), same key for {(dense_indexes == sparse_indexes).mean():.1%} of elements')
@@ -0,0 +1,103 @@
+'''
+replay autofill_current_page on saved application forms served locally, reporting wall time, fields filled and answer accuracy.
+Forms are the synthetic pages of benchmarks/form_fixtures.py, plus any .html files of --pages-dir
+(saved real forms, with a data-expected attribute added to the controls to score).
+Answers are those of the fictional applicant of form_fixtures.persona_answers(), unless --folder is given
+
+run from the repository root with: python -m benchmarks.bench_autofill [--snapshot] [--inject] [--json results.json]
+'''
+import argparse
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from auto_apply import AutoApply
+from scraper import headless_chrome
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.form_fixtures import make_corpus, persona_answers
+
+
+# value of every visible control, the selected option's text for selects and '' when nothing is selected
+read_values_js = '''
+return Array.from(document.querySelectorAll('input:not([type=hidden]):not([type=checkbox]):not([type=radio]), select, textarea'), el => {
+    let value = el.value;
+    if (el.tagName === 'SELECT')
+        value = el.value === '' || el.selectedIndex < 0 ? '' : el.options[el.selectedIndex].text;
+    return {expected: el.hasAttribute('data-expected') ? el.getAttribute('data-expected') : null, value: value.trim(), visible: el.offsetParent !== null};
+});
+'''
+
+
+def make_folder(answers_folder: str=None):
+    '''return a temporary AutoApply folder, with the form answers of answers_folder or of the fictional applicant'''
+    folder = tempfile.mkdtemp(prefix='bench_autofill_')+'/'
+    if answers_folder:
+        shutil.copy(os.path.join(answers_folder, 'form_answers.json'), folder)
+    else:
+        with open(folder+'form_answers.json', 'w') as f:
+            json.dump(persona_answers(), f, indent=4)
+    open(folder+'search_urls.txt', 'w').close()
+    return folder
+
+
+def score(controls: list[dict]):
+    labelled = [c for c in controls if c['expected'] is not None]
+    return {
+        'controls': len(controls),
+        'filled': sum(bool(c['value']) for c in controls if c['visible']),
+        'labelled': len(labelled),
+        'correct': sum(c['value'] == c['expected'].strip() for c in labelled),
+    }
+
+
+def run_page(app: AutoApply, url: str, snapshot: bool, inject: bool):
+    app.driver.get(url)
+    t = time.perf_counter()
+    app.autofill_current_page(delay=0, snapshot=snapshot, inject=inject)
+    elapsed = time.perf_counter() - t
+    result = score(app.driver.execute_script(read_values_js))
+    result['seconds'] = elapsed
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages-dir', help='folder of saved .html forms to replay along with the synthetic ones')
+    parser.add_argument('--folder', help='folder containing the form_answers.json to use, the fictional applicant\'s by default')
+    parser.add_argument('--runs', type=int, default=3, help='runs per page, the fastest is reported')
+    parser.add_argument('--snapshot', action='store_true', help='pass snapshot=True to autofill_current_page')
+    parser.add_argument('--inject', action='store_true', help='pass inject=True to autofill_current_page')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    pages = make_corpus()
+    if args.pages_dir:
+        for path in sorted(glob.glob(os.path.join(args.pages_dir, '*.html'))):
+            with open(path, encoding='utf-8') as f:
+                pages['/saved/'+os.path.basename(path)] = f.read()
+
+    folder = make_folder(args.folder)
+    app = AutoApply(folder, driver=headless_chrome())
+    app.wait_until_ready() # model loading is not part of the timings
+    results = {}
+    try:
+        with FixtureServer(pages) as server:
+            for path in pages:
+                runs = [run_page(app, server.url(path), args.snapshot, args.inject) for _ in range(args.runs)]
+                best = min(runs, key=lambda r: r['seconds'])
+                results[path] = best
+                accuracy = best['correct'] / best['labelled'] if best['labelled'] else float('nan')
+                print(f"{path}: {best['seconds']:.2f} s, {best['filled']} of {best['controls']} controls filled, "
+                      f"{best['correct']}/{best['labelled']} labelled controls correct ({accuracy:.0%})")
+    finally:
+        app.close()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    total = {k: sum(r[k] for r in results.values()) for k in ['seconds', 'filled', 'controls', 'correct', 'labelled']}
+    print(f"total: {total['seconds']:.2f} s, {total['filled']} controls filled, {total['correct']}/{total['labelled']} correct")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'snapshot': args.snapshot, 'inject': args.inject, 'pages': results, 'total': total}, f, indent=4)
@@ -0,0 +1,89 @@
+'''
+compare the encoder backends on the shipped form_answers.json keys and the labels of the synthetic application forms:
+load time, encoding latency, peak memory, and agreement of the best matching key with the fp32 torch backend.
+Every backend runs in a fresh python process, so memory is not shared between them. The first onnx run includes exporting the model
+
+run from the repository root with: python -m benchmarks.bench_encoders [--threads 4] [--backends torch onnx onnx-int8]
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from encoders import encoder_backends
+from parsing import parse_html
+from benchmarks.form_fixtures import make_corpus
+
+
+run_once = r'''
+import json, resource, sys, time
+import numpy as np
+from encoders import make_encoder
+backend, model_name, export_folder, threads, texts_path, out_path, runs = sys.argv[1:]
+with open(texts_path) as f:
+    texts = json.load(f)
+t = time.perf_counter()
+encoder = make_encoder(backend, model_name, export_folder, int(threads) or None)
+t_load = time.perf_counter() - t
+embs = encoder.encode(texts) # warm up
+batch, single = [], []
+for _ in range(int(runs)):
+    t = time.perf_counter()
+    encoder.encode(texts)
+    batch.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    for text in texts[:20]:
+        encoder.encode([text])
+    single.append((time.perf_counter() - t) / 20)
+np.save(out_path, embs)
+print(json.dumps({'load': t_load, 'batch': min(batch), 'single': min(single), 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+'''
+
+
+def form_labels():
+    '''label texts of the synthetic application forms, standing in for the form elements autofill matches to keys'''
+    labels = []
+    for html in make_corpus().values():
+        labels += [l.get_text().strip() for l in parse_html(html).find_all('label')]
+    return list(dict.fromkeys(l for l in labels if l))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backends', nargs='+', default=encoder_backends, choices=encoder_backends)
+    parser.add_argument('--model', default='multi-qa-mpnet-base-cos-v1')
+    parser.add_argument('--export-folder', default='file_templates/encoders/')
+    parser.add_argument('--threads', type=int, default=0, help='encoder threads, 0 for the backend default')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with open('file_templates/form_answers.json') as f:
+        keys = list(json.load(f))
+    labels = form_labels()
+    tmp = tempfile.mkdtemp(prefix='bench_encoders_')
+    texts_path = os.path.join(tmp, 'texts.json')
+    with open(texts_path, 'w') as f:
+        json.dump(keys + labels, f)
+    print(f'{len(keys)} form answer keys, {len(labels)} form labels')
+
+    reference = None
+    for backend in args.backends:
+        out_path = os.path.join(tmp, backend+'.npy')
+        out = subprocess.run([sys.executable, '-c', run_once, backend, args.model, args.export_folder, str(args.threads), texts_path, out_path, str(args.runs)],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        embs = np.load(out_path)
+        key_embs, label_embs = embs[:len(keys)], embs[len(keys):]
+        matches = (label_embs @ key_embs.T).argmax(axis=1) # embeddings are normalized
+        line = (f"{backend}: load {result['load']:.1f} s, {len(embs)} texts in {result['batch']*1000:.0f} ms, "
+                f"one text {result['single']*1000:.1f} ms, peak memory {result['peak_rss_mb']:.0f} MB")
+        if reference is None:
+            reference = (backend, embs, matches)
+        else:
+            cos = (embs * reference[1]).sum(axis=1) / np.linalg.norm(embs, axis=1) / np.linalg.norm(reference[1], axis=1)
+            line += f", best key agreement with {reference[0]} {(matches == reference[2]).mean():.1%}, embedding cosine {cos.mean():.4f} (min {cos.min():.4f})"
+        print(line)
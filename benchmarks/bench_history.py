@@ -0,0 +1,62 @@
+'''
+compare the size and load time of a synthetic job history with descriptions held in every record (as before the blob store)
+and referenced in a BlobStore, with each job scraped from several searches and viewed, as in real use.
+Descriptions are the text of whole pages, with and without their boilerplate stripped
+
+run from the repository root with: python -m benchmarks.bench_history [--jobs 5000]
+'''
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from blob_store import BlobStore
+from parsing import page_text, parse_html
+from storage import JsonlStorage
+
+
+def make_page(rng: random.Random, vocabulary: list[str], words=300):
+    nav = '<nav>' + ''.join(f'<a href="/{w}">{w.title()}</a>\n' for w in vocabulary[:40]) + '</nav>'
+    footer = '<footer>' + '\n'.join(f'<p>{" ".join(vocabulary[i:i+12])}</p>' for i in range(0, 240, 12)) + '</footer>'
+    description = '\n'.join('<p>    ' + ' '.join(rng.choice(vocabulary) for _ in range(30)) + '    </p>\n\n' for _ in range(words // 30))
+    return f'<html><head><script>var tracking = {rng.random()};</script></head><body>{nav}<main><h1>Job</h1>{description}</main>{footer}</body></html>'
+
+
+def folder_size(folder: str):
+    return sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=5000, help='distinct jobs')
+    parser.add_argument('--repeats', type=int, default=3, help='times each job is scraped')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10))) for _ in range(5000)]
+    pages = [make_page(rng, vocabulary) for _ in range(args.jobs)]
+    filenames = {'scraped': 'scraped_jobs.jsonl', 'seen': 'seen_jobs.jsonl', 'applied': 'applied_jobs.jsonl'}
+    for name, text in [('whole page text', lambda page: parse_html(page).get_text()), ('boilerplate stripped', lambda page: page_text(parse_html(page)))]:
+        descriptions = [text(page) for page in pages]
+        jobs = [{'search_url': 'search', 'apply_url': f'https://example.com/apply/{i}', 'description': d, 'date_scraped': datetime.datetime.now()}
+                for i, d in enumerate(descriptions)]
+        for blobs in [False, True]:
+            with tempfile.TemporaryDirectory() as folder:
+                folder += '/'
+                storage = JsonlStorage(folder, filenames, BlobStore(folder+'descriptions.pack') if blobs else None)
+                t = time.perf_counter()
+                for _ in range(args.repeats):
+                    storage.append('scraped', jobs)
+                storage.append('seen', jobs)
+                t_write = time.perf_counter() - t
+                size = folder_size(folder)
+                t = time.perf_counter()
+                history = storage.load('scraped') + storage.load('seen')
+                t_load = time.perf_counter() - t
+                t = time.perf_counter()
+                n_chars = sum(len(job['description']) for job in history[:len(jobs)]) # what reading every description costs on top
+                t_read = time.perf_counter() - t
+            print(f"{name}, {'blob store' if blobs else 'inline'}: {size/2**20:.1f} MiB, write {t_write:.2f} s, "
+                  f"load {len(history)} records {t_load:.2f} s, read {len(jobs)} descriptions {t_read:.2f} s ({n_chars} chars)")
@@ -0,0 +1,43 @@
+'''
+scrape a synthetic indeed served locally by a server that challenges clients going over a rate limit,
+with page loads paced at fixed delays and by the adaptive NavigationScheduler
+
+run from the repository root with: python -m benchmarks.bench_navigation [--max-rate 5]
+'''
+import argparse
+import time
+from urllib.parse import urlparse
+
+from auto_apply import AutoApply
+from navigation import NavigationScheduler
+from scraper import ScrapePool, headless_chrome
+from benchmarks.fixture_server import ThrottlingFixtureServer
+from benchmarks.indeed_fixtures import make_site
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--searches', type=int, default=4)
+    parser.add_argument('--jobs-per-search', type=int, default=10)
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--max-rate', type=float, default=5., help='requests per second the server tolerates')
+    parser.add_argument('--penalty', type=float, default=2., help='seconds the server challenges every request once the rate is exceeded')
+    parser.add_argument('--delays', type=float, nargs='+', default=[1., .2], help='fixed delays between page loads to compare with')
+    args = parser.parse_args()
+
+    # only the page parsing methods of AutoApply are used, which need neither a model nor a browser
+    parser_app = AutoApply.__new__(AutoApply)
+    pages, search_paths = make_site(args.searches, args.jobs_per_search)
+    # fixed delays: the rate starts at 1/delay and stays there, challenges only set off the retries
+    navigators = {f'fixed {d} s': NavigationScheduler(start_rate=1/d, max_rate=1/d, decrease=1., backoff=args.penalty) for d in args.delays}
+    navigators['adaptive'] = NavigationScheduler(backoff=args.penalty)
+    for name, navigator in navigators.items():
+        # the company portals apply redirects land on are other sites, only the redirect counts against the limit
+        with ThrottlingFixtureServer(pages, args.max_rate, args.penalty, other_sites=['/portal/']) as server:
+            pool = ScrapePool(parser_app, headless_chrome, n_sessions=args.sessions, navigator=navigator)
+            t = time.perf_counter()
+            jobs = list(pool.run([server.url(p) for p in search_paths]))
+            elapsed = time.perf_counter() - t
+            stats = navigator.stats()[urlparse(server.url('/')).netloc]
+            print(f"{name}: {len(jobs)}/{args.searches * args.jobs_per_search} jobs in {elapsed:.2f} s, "
+                  f"{stats['loads']} page loads, {server.challenges} challenged, final rate {stats['rate']:.2f}/s")
@@ -0,0 +1,70 @@
+'''
+build the near-duplicate index over a synthetic corpus of job descriptions, then time lookups of edited reposts and of new jobs
+
+run from the repository root with: python -m benchmarks.bench_near_duplicates [--jobs 100000]
+'''
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import jsonlines as jsonl
+import numpy as np
+
+from near_duplicates import NearDuplicateIndex
+from storage import JsonlStorage
+
+
+def make_description(rng: random.Random, vocabulary: list[str], words=300):
+    return ' '.join(rng.choice(vocabulary) for _ in range(words))
+
+
+def repost(rng: random.Random, description: str):
+    '''small edits of a reposted job: new date, tracking blurb, apply text'''
+    return f'Posted {rng.randint(1, 30)} days ago. ' + description + ' Apply now! ref=' + str(rng.randint(0, 10**9))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--threshold', type=float, default=.8)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = ['word%d' % i for i in range(20000)]
+    with tempfile.TemporaryDirectory() as folder:
+        jsonl_path = os.path.join(folder, 'scraped_jobs.jsonl')
+        t = time.perf_counter()
+        originals = []
+        with jsonl.open(jsonl_path, 'w') as f:
+            for i in range(args.jobs):
+                description = make_description(rng, vocabulary)
+                if i < args.queries:
+                    originals.append(description)
+                f.write({'apply_url': 'https://example.com/job/%d' % i, 'description': description})
+        print(f'generated {args.jobs} jobs in {time.perf_counter()-t:.1f} s')
+
+        storage = JsonlStorage(folder+'/', {'scraped': 'scraped_jobs.jsonl'})
+        index = NearDuplicateIndex(storage, os.path.join(folder, 'scraped_jobs.minhash'), args.threshold)
+        t = time.perf_counter()
+        index.load()
+        print(f'indexed {len(index.records)} jobs in {time.perf_counter()-t:.1f} s ({index.bands} bands of {index.rows} rows)')
+        t = time.perf_counter()
+        NearDuplicateIndex(storage, os.path.join(folder, 'scraped_jobs.minhash'), args.threshold).load()
+        print(f'reloaded stored index in {time.perf_counter()-t:.2f} s')
+
+        reposts = [repost(rng, d) for d in originals]
+        new_jobs = [make_description(rng, vocabulary) for _ in range(args.queries)]
+        for name, queries, expect_found in [('reposts', reposts, True), ('new jobs', new_jobs, False)]:
+            signatures = [index.hasher.signature(q) for q in queries]
+            t = time.perf_counter()
+            found = [len(index.query(q, sig)) > 0 for q, sig in zip(queries, signatures)]
+            lookup = (time.perf_counter() - t) / len(queries)
+            t = time.perf_counter()
+            for q in queries:
+                index.query(q)
+            total = (time.perf_counter() - t) / len(queries)
+            rate = np.mean(found) if expect_found else 1 - np.mean(found)
+            print(f'{name}: {"recall" if expect_found else "true negative rate"} {rate:.3f}, lookup {lookup*1e3:.3f} ms, with signature {total*1e3:.3f} ms')
@@ -0,0 +1,84 @@
+'''
+time parsing a heavy single page application form and an indeed description page, the way autofill_current_page and get_page used to
+(whole page with html.parser, one find_all scan per kind of control) against the current way
+(lxml, only the form subtree returned by parsing.form_root_js or the parts matched by a strainer, one scan for every control)
+
+run from the repository root with: python -m benchmarks.bench_parsing [--noise-kb 2000]
+'''
+import argparse
+import json
+import random
+import time
+
+from auto_apply import AutoApply
+from parsing import parse_html, description_page_strainer
+from benchmarks.form_fixtures import persona_answers, workday_page
+from benchmarks.indeed_fixtures import description_page
+
+
+def spa_noise(kb: int, seed=0):
+    '''navigation, cards and a state blob like those surrounding the form of a single page application'''
+    rng = random.Random(seed)
+    state = json.dumps([{'id': i, 'label': 'item %d' % rng.randrange(10**6), 'tags': ['t%d' % rng.randrange(100) for _ in range(5)]} for i in range(kb * 4)])
+    cards = ''.join(f'<div class="card"><div class="card-body"><span class="title">Recommended job {i}</span><p>{"lorem ipsum dolor sit amet " * 6}</p>'
+                    f'<a href="/job/{i}">View</a></div></div>' for i in range(kb * 2))
+    return f'<nav>{"".join(f"<a href=/section/{i}>Section {i}</a>" for i in range(200))}</nav><aside>{cards}</aside><script type="application/json">{state}</script>'
+
+
+def old_form_elements(page):
+    form_els = []
+    for el in ['input', 'select', 'textarea', 'datalist',  'optgroup']:
+        form_els += page.find_all(el)
+    return form_els
+
+
+def best_time(f, runs: int):
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        result = f()
+        times.append(time.perf_counter() - t)
+    return min(times), result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--noise-kb', type=int, default=2000, help='approximate size of the page around the form')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    # only the parsing methods of AutoApply are used, which need neither a model nor a browser
+    app = AutoApply.__new__(AutoApply)
+    form = workday_page(persona_answers())
+    form = form[form.index('<main>'):form.index('</main>')+len('</main>')]
+    noise = spa_noise(args.noise_kb)
+    page = f'<html><head><title>Apply</title></head><body><div id="app">{noise}<div class="apply-flow">{form}</div>{noise}</div></body></html>'
+    form_subtree = f'<div class="apply-flow">{form}</div>' # what form_root_js returns for this page
+    print(f'form page: {len(page)/1e6:.1f} MB, form subtree: {len(form_subtree)/1e3:.0f} kB')
+
+    def old_form():
+        p = parse_html(page, 'html.parser')
+        return old_form_elements(p), app.get_text_index(p)
+
+    def new_form(html, parser):
+        p = parse_html(html, parser)
+        return app.get_form_elements_html(p), app.get_text_index(p)
+
+    t_old, (els_old, _) = best_time(old_form, args.runs)
+    print(f'html.parser, whole page, one scan per control kind: {t_old:.3f} s ({len(els_old)} controls)')
+    for name, html, parser in [('html.parser, whole page, one scan', page, 'html.parser'), ('lxml, whole page, one scan', page, 'lxml'), ('lxml, form subtree, one scan', form_subtree, 'lxml')]:
+        t, (els, _) = best_time(lambda: new_form(html, parser), args.runs)
+        assert sorted(str(e) for e in els) == sorted(str(e) for e in els_old)
+        print(f'{name}: {t:.3f} s ({t_old/t:.1f}x faster)')
+
+    description = description_page('1', words=2000).replace('<footer>', noise+'<footer>')
+    print(f'\ndescription page: {len(description)/1e6:.1f} MB')
+    def extract(parser, parse_only=None):
+        p = parse_html(description, parser, parse_only)
+        return app.get_description(p), app.get_indeed_apply_url(p)
+    t_old, extracted = best_time(lambda: extract('html.parser'), args.runs)
+    print(f'html.parser, whole page: {t_old:.3f} s')
+    for name, parser, parse_only in [('lxml, whole page', 'lxml', None), ('lxml, description strainer', 'lxml', description_page_strainer)]:
+        t, result = best_time(lambda: extract(parser, parse_only), args.runs)
+        assert result == extracted
+        print(f'{name}: {t:.3f} s ({t_old/t:.1f}x faster)')
@@ -0,0 +1,60 @@
+'''
+scrape a synthetic indeed served locally with a simulated network latency, with ScrapePool and with the resumable crawl_jobs.
+Some jobs have no apply link (easy apply), their apply url is their description page's
+
+run from the repository root with: python -m benchmarks.bench_scrape
+'''
+import argparse
+import tempfile
+import time
+
+from auto_apply import AutoApply
+from scraper import ScrapePool, headless_chrome
+from navigation import NavigationScheduler
+from parsing import default_html_parser
+from profiling import Metrics
+from storage import JsonlStorage
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.indeed_fixtures import make_site
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--searches', type=int, default=4)
+    parser.add_argument('--jobs-per-search', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=.3, help='seconds added to every response')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--easy-apply-every', type=int, default=5, help='one job in this many has no apply link, 0 for none')
+    args = parser.parse_args()
+
+    # only the page parsing methods of AutoApply are used, which need neither a model nor a browser
+    parser_app = AutoApply.__new__(AutoApply)
+    pages, search_paths = make_site(args.searches, args.jobs_per_search, easy_apply_every=args.easy_apply_every)
+    with FixtureServer(pages, args.latency) as server:
+        search_urls = [server.url(p) for p in search_paths]
+        for n in args.sessions:
+            # the fixture server does not throttle, so page loads are not paced either
+            unpaced = NavigationScheduler(start_rate=1e6, max_rate=1e6, burst=1e6)
+            pool = ScrapePool(parser_app, headless_chrome, n_sessions=n, navigator=unpaced)
+            t = time.perf_counter()
+            jobs = list(pool.run(search_urls))
+            elapsed = time.perf_counter() - t
+            assert len(jobs) == args.searches * args.jobs_per_search, len(jobs)
+            assert all('/portal/' in j['apply_url'] or j['apply_url'] == j['description_url'] for j in jobs)
+            print(f'{n} sessions: {len(jobs)} jobs in {elapsed:.2f} s (includes starting {n} browsers)')
+
+        # crawl_jobs only needs the storage, navigator, driver and metrics of an AutoApply
+        with tempfile.TemporaryDirectory() as folder:
+            parser_app.folder_name, parser_app.crawl_checkpoint_filename = folder+'/', 'crawl_checkpoint.json'
+            parser_app.storage = JsonlStorage(folder+'/', {'scraped': 'scraped_jobs.jsonl', 'seen': 'seen_jobs.jsonl', 'applied': 'applied_jobs.jsonl'})
+            parser_app.navigator = NavigationScheduler(start_rate=1e6, max_rate=1e6, burst=1e6)
+            parser_app.metrics, parser_app.html_parser, parser_app.max_requeues = Metrics(), default_html_parser, 2
+            parser_app.driver = headless_chrome()
+            try:
+                t = time.perf_counter()
+                jobs = list(parser_app.crawl_jobs(search_urls, max_pages=1, resume=False))
+                elapsed = time.perf_counter() - t
+            finally:
+                parser_app.driver.quit()
+            assert len(jobs) == args.searches * args.jobs_per_search, len(jobs) # jobs without an apply link included
+            print(f'crawl_jobs: {len(jobs)} jobs in {elapsed:.2f} s')
@@ -0,0 +1,51 @@
+'''
+time AutoApply startup: until the constructor returns, and until the model and form answers are ready.
+Every run is a fresh python process. Cold runs start without cached form answer embeddings, warm runs with them
+
+run from the repository root with: python -m benchmarks.bench_startup [--folder file_templates/] [--no-browser]
+'''
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+
+run_once = r'''
+import json, sys, time
+t0 = time.perf_counter()
+from auto_apply import AutoApply
+t_import = time.perf_counter()
+class NoBrowser():
+    def quit(self): pass
+app = AutoApply(sys.argv[1], driver=NoBrowser() if sys.argv[2] == '1' else None, headless=True)
+t_constructed = time.perf_counter()
+app.wait_until_ready()
+t_ready = time.perf_counter()
+app.driver.quit()
+print(json.dumps({'import': t_import-t0, 'constructed': t_constructed-t0, 'ready': t_ready-t0}))
+'''
+
+
+def run(folder: str, no_browser: bool):
+    out = subprocess.run([sys.executable, '-c', run_once, folder, '1' if no_browser else '0'], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--folder', default='file_templates/')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--no-browser', action='store_true', help='time model and answers loading only, without starting headless chrome')
+    args = parser.parse_args()
+
+    for name, clear_cache in [('cold', True), ('warm', False)]:
+        times = []
+        for _ in range(args.runs):
+            if clear_cache:
+                for f in glob.glob(os.path.join(args.folder, 'form_answers.emb.*')):
+                    os.remove(f)
+            times.append(run(args.folder, args.no_browser))
+        best = {k: min(t[k] for t in times) for k in times[0]}
+        print(f"{name}: import {best['import']:.2f} s, constructor returns {best['constructed']:.2f} s, model and answers ready {best['ready']:.2f} s")
@@ -0,0 +1,46 @@
+'''
+micro-benchmark of removing characters unknown to sbert: per-character tokenizer calls (the old strip_unks) vs utils.UnkStripper
+
+run from the repository root with: python -m benchmarks.bench_strip_unks
+'''
+import random
+import time
+
+from transformers import AutoTokenizer
+
+from utils import UnkStripper
+
+
+def naive_strip_unks(tokenizer, strings):
+    return [''.join([c for c in s if tokenizer(c)['input_ids'][1] != 104]) for s in strings]
+
+
+def make_page_strings(n_fields=100, context_size=256, seed=0):
+    '''contexts of a synthetic form page: mostly ascii with some accents, symbols, CJK and emoji sprinkled in'''
+    rng = random.Random(seed)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz     ABCDEFGHIJ0123456789.,:;?()/-' + 'éèàüßñ' + '€£©®™•' + '日本語中文' + '😀🚀✓✔'
+    return [''.join(rng.choice(alphabet) for _ in range(context_size)) for _ in range(n_fields)]
+
+
+if __name__ == '__main__':
+    tokenizer = AutoTokenizer.from_pretrained('sentence-transformers/multi-qa-mpnet-base-cos-v1')
+    strings = make_page_strings()
+
+    t = time.perf_counter()
+    expected = naive_strip_unks(tokenizer, strings)
+    naive_time = time.perf_counter() - t
+
+    stripper = UnkStripper(tokenizer)
+    t = time.perf_counter()
+    cold = stripper(strings)
+    cold_time = time.perf_counter() - t
+    t = time.perf_counter()
+    warm = stripper(make_page_strings(seed=1))
+    warm_time = time.perf_counter() - t
+
+    assert cold == expected, 'UnkStripper output differs from per-character tokenization'
+    assert warm == naive_strip_unks(tokenizer, make_page_strings(seed=1)), 'UnkStripper output differs from per-character tokenization'
+    print(f'{len(strings)} strings of {len(strings[0])} characters')
+    print(f'per-character tokenizer: {naive_time*1000:.1f} ms')
+    print(f'UnkStripper, first page: {cold_time*1000:.2f} ms ({naive_time/cold_time:.0f}x)')
+    print(f'UnkStripper, next page:  {warm_time*1000:.2f} ms ({naive_time/warm_time:.0f}x)')
@@ -0,0 +1,113 @@
+'''local http server for fixture pages, so scraping and autofill can be run against something other than live sites'''
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+class FixtureServer():
+    '''
+    serves fixture pages from a background thread, use as a context manager
+
+        Parameters
+        ----------
+        pages : dict
+            maps a path (with query string, e.g. '/jobs?q=1') to either html str, or ('redirect', location)
+        latency : float, default 0
+            seconds to wait before every response, to simulate a remote site
+    '''
+
+    def __init__(self, pages: dict, latency=0.) -> None:
+        self.pages = pages
+        self.latency = latency
+        self.requests = [] # paths in order of request
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                time.sleep(server.latency)
+                page = server.respond(self)
+                if page is None:
+                    self.send_error(404)
+                elif isinstance(page, tuple) and page[0] == 'redirect':
+                    self.send_response(302)
+                    self.send_header('Location', page[1])
+                    self.end_headers()
+                else:
+                    status, html = page if isinstance(page, tuple) else (200, page)
+                    body = html.encode('utf-8')
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = 'http://127.0.0.1:%d' % self.httpd.server_address[1]
+
+    def respond(self, handler: BaseHTTPRequestHandler):
+        '''return the page for a request, override to serve dynamic responses'''
+        return self.pages.get(handler.path, self.pages.get(urlparse(handler.path).path))
+
+    def url(self, path: str):
+        return self.base_url + path
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+challenge_page = '''<html><head><title>Just a moment...</title></head>
+<body><div id="challenge-running">Checking your browser before accessing the site.</div></body></html>'''
+
+
+class ThrottlingFixtureServer(FixtureServer):
+    '''
+    FixtureServer that answers like a site behind an anti-bot service: when more than max_rate requests arrived
+    in the last second, requests get a challenge page (status 429) until penalty seconds without going over.
+    Paths starting with one of other_sites are served as by another host: neither counted nor challenged
+
+        Parameters
+        ----------
+        pages : dict
+            as for FixtureServer
+        max_rate : float, default 5.
+            requests per second tolerated
+        penalty : float, default 2.
+            seconds every request is challenged after the rate was exceeded
+        latency : float, default 0
+            seconds to wait before every response
+        other_sites : list[str], default []
+            path prefixes of the pages of other hosts, e.g. the company portals apply redirects land on
+    '''
+
+    def __init__(self, pages: dict, max_rate=5., penalty=2., latency=0., other_sites: list[str]=[]) -> None:
+        super().__init__(pages, latency)
+        self.max_rate = max_rate
+        self.penalty = penalty
+        self.other_sites = other_sites
+        self.recent = [] # arrival times of the requests of the last second
+        self.blocked_until = 0.
+        self.challenges = 0
+        self.lock = threading.Lock()
+
+    def respond(self, handler: BaseHTTPRequestHandler):
+        if any(handler.path.startswith(p) for p in self.other_sites):
+            return super().respond(handler)
+        with self.lock:
+            now = time.monotonic()
+            self.recent = [t for t in self.recent if t > now - 1] + [now]
+            if len(self.recent) > self.max_rate:
+                self.blocked_until = now + self.penalty
+            if now < self.blocked_until:
+                self.challenges += 1
+                return (429, challenge_page)
+        return super().respond(handler)
@@ -0,0 +1,205 @@
+'''
+synthetic application forms in the style of common portals (greenhouse, lever, workday), with labelled expected answers.
+Every control with a data-expected attribute should end up with that value (for a select: the text of the selected option),
+data-expected="" marks questions the answers do not cover, that should be left blank
+'''
+from html import escape
+
+
+places = ['first', 'second', 'third', 'fourth', 'fifth', 'sixth']
+months = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+countries = ['Afghanistan', 'Argentina', 'Australia', 'Austria', 'Belgium', 'Brazil', 'Canada', 'Chile', 'China', 'Colombia', 'Denmark', 'Egypt',
+             'Finland', 'France', 'Germany', 'Greece', 'India', 'Ireland', 'Israel', 'Italy', 'Japan', 'Mexico', 'Netherlands', 'New Zealand', 'Norway',
+             'Poland', 'Portugal', 'Spain', 'Sweden', 'Switzerland', 'United Kingdom', 'United States']
+countries += ['Territory %d' % i for i in range(250 - len(countries))]
+us_states = ['Alabama', 'Alaska', 'Arizona', 'California', 'Colorado', 'Florida', 'Georgia', 'Illinois', 'New York', 'Texas', 'Washington']
+
+
+def persona_answers():
+    '''return a complete form_answers.json for a fictional applicant, with the keys of file_templates/form_answers.json'''
+    answers = {
+        'refered from': 'LinkedIn',
+        'country': 'United States',
+        'full name': 'Alex Morgan',
+        'forename / first name': 'Alex',
+        'surname / last name': 'Morgan',
+        'email': 'alex.morgan@example.com',
+        'phone device type': 'Mobile',
+        'telephone number': '555-0142',
+        'address line 1': '12 Main Street',
+        'address city': 'Springfield',
+        'address state': 'Illinois',
+        'address postal code': '62701',
+        'how did you learn about us / hear about this opportunity?': 'LinkedIn',
+        'are you legally authorized to work in the united states?': 'Yes',
+        'will you require sponsorship for work authorization in the united states?': 'No',
+        'gender': 'Decline to self-identify',
+        'race': 'Decline to self-identify',
+        'veteran status': 'I am not a protected veteran',
+        'additional information / cover letter': 'I am excited to apply. ' * 20,
+        'first link: linkedin': 'https://www.linkedin.com/in/alex-morgan-example',
+        'second link: github': 'https://github.com/alex-morgan-example',
+        'skills': 'Python, natural language processing, machine learning, SQL',
+    }
+    for i, place in enumerate(places):
+        start_year, end_year = 2022 - 2*i, 2024 - 2*i
+        answers.update({
+            f'{place} work experience job title / position': f'Engineer level {6-i}',
+            f'{place} work experience company': f'Company number {i+1}',
+            f'{place} work experience start date': f'0{i+1}/{start_year}',
+            f'{place} work from month': months[i],
+            f'{place} work from year': str(start_year),
+            f'{place} work experience end date': f'0{i+1}/{end_year}',
+            f'{place} work to month': months[i+1],
+            f'{place} work to year': str(end_year),
+            f'{place} work experience description': f'Built systems at company number {i+1}. ' * 5,
+        })
+    # keys of the template that are phrased differently from the others
+    answers['first work experience start date (from)'] = answers.pop('first work experience start date')
+    answers['first work experience end date (to)'] = answers.pop('first work experience end date')
+    answers['second date from month'] = answers.pop('second work from month')
+    answers['second date from year'] = answers.pop('second work from year')
+    answers.update({
+        'first education university': 'University of Springfield',
+        'first education degree': "Master's Degree",
+        'first education field of study/concentration/major': 'Computer Science',
+        'first education from': '2014',
+        'first education to': '2016',
+        'first education GPA': '3.8',
+        'second education university': 'Springfield College',
+        'second education degree': "Bachelor's Degree",
+        'second education field of study': 'Mathematics',
+        'second education first field of study/concentration/major': 'Mathematics',
+        'second education second field of study/concentration/major': 'Linguistics',
+        'second education from': '2010',
+        'second education to': '2014',
+        'second education GPA': '3.6',
+    })
+    return answers
+
+
+def text_field(label: str, expected: str, name: str, tag='input', input_type='text', wrapper='div class="field"'):
+    attrs = f'name="{escape(name)}" id="{escape(name)}" data-expected="{escape(expected)}"'
+    control = f'<textarea {attrs}></textarea>' if tag == 'textarea' else f'<input type="{input_type}" {attrs}>'
+    return f'<{wrapper}><label for="{escape(name)}">{escape(label)}</label>{control}</{wrapper.split()[0]}>'
+
+
+def select_field(label: str, expected: str, name: str, options: list[str], wrapper='div class="field"'):
+    opts = '<option value="">Select...</option>' + ''.join(f'<option value="{i}">{escape(o)}</option>' for i, o in enumerate(options))
+    return f'<{wrapper}><label for="{escape(name)}">{escape(label)}</label><select name="{escape(name)}" id="{escape(name)}" data-expected="{escape(expected)}">{opts}</select></{wrapper.split()[0]}>'
+
+
+def page(title: str, body: str):
+    return f'<!DOCTYPE html><html><head><title>{escape(title)}</title></head><body><header>Careers</header><main>{body}</main><footer>Privacy policy</footer></body></html>'
+
+
+def greenhouse_page(a: dict):
+    fields = [
+        text_field('First Name *', a['forename / first name'], 'first_name'),
+        text_field('Last Name *', a['surname / last name'], 'last_name'),
+        text_field('Email *', a['email'], 'email', input_type='email'),
+        text_field('Phone', a['telephone number'], 'phone', input_type='tel'),
+        text_field('LinkedIn Profile', a['first link: linkedin'], 'linkedin'),
+        text_field('Github', a['second link: github'], 'github'),
+        text_field('Cover Letter', a['additional information / cover letter'], 'cover_letter', tag='textarea'),
+        select_field('Are you legally authorized to work in the United States?', a['are you legally authorized to work in the united states?'], 'q_auth', ['Yes', 'No']),
+        select_field('Will you now or in the future require sponsorship for employment visa status?', a['will you require sponsorship for work authorization in the united states?'], 'q_sponsor', ['Yes', 'No']),
+        text_field('How did you hear about this job?', a['how did you learn about us / hear about this opportunity?'], 'q_source'),
+        text_field('What is your favourite programming paradigm and why?', '', 'q_paradigm', tag='textarea'),
+    ]
+    eeo = [
+        select_field('Gender', a['gender'], 'gender', ['Male', 'Female', 'Decline to self-identify']),
+        select_field('Race', a['race'], 'race', ['Asian', 'Black or African American', 'White', 'Two or More Races', 'Decline to self-identify']),
+        select_field('Veteran Status', a['veteran status'], 'veteran', ['I am a protected veteran', 'I am not a protected veteran', "I don't wish to answer"]),
+    ]
+    body = ('<h1>Apply for this job</h1><form id="application_form">' + ''.join(fields)
+            + '<h2>U.S. Equal Employment Opportunity Information</h2>' + ''.join(eeo)
+            + '<input type="hidden" name="authenticity_token" value="abc123"><button type="submit">Submit Application</button></form>')
+    return page('Greenhouse application', body)
+
+
+def lever_page(a: dict):
+    li = 'li class="application-question"'
+    fields = [
+        text_field('Full name', a['full name'], 'name', wrapper=li),
+        text_field('Email', a['email'], 'email', wrapper=li),
+        text_field('Phone', a['telephone number'], 'phone', wrapper=li),
+        text_field('Current company', a['first work experience company'], 'org', wrapper=li),
+        text_field('LinkedIn URL', a['first link: linkedin'], 'urls[LinkedIn]', wrapper=li),
+        text_field('GitHub URL', a['second link: github'], 'urls[GitHub]', wrapper=li),
+        text_field('Additional information', a['additional information / cover letter'], 'comments', tag='textarea', wrapper=li),
+        select_field('Country', a['country'], 'country', countries, wrapper=li),
+    ]
+    body = ('<div class="posting-header"><h2>Senior NLP Engineer</h2></div><form><h4>Submit your application</h4><ul>' + ''.join(fields)
+            + '</ul><h4>Links</h4><ul>' + text_field('Portfolio URL', '', 'urls[Portfolio]', wrapper=li) + '</ul></form>')
+    return page('Lever application', body)
+
+
+def workday_page(a: dict, n_jobs=6, n_hidden=100):
+    '''a long multi-section workday style form, over 200 controls with the default arguments'''
+    def section(title, content):
+        return f'<div data-automation-id="section"><h3>{escape(title)}</h3>{content}</div>'
+
+    my_info = ''.join([
+        select_field('How Did You Hear About Us?', a['how did you learn about us / hear about this opportunity?'], 'source', ['Job board', 'LinkedIn', 'Referral', 'Company website']),
+        select_field('Country', a['country'], 'countryDropdown', countries),
+        text_field('Given Name(s)', a['forename / first name'], 'legalNameSection_firstName'),
+        text_field('Family Name', a['surname / last name'], 'legalNameSection_lastName'),
+        text_field('Address Line 1', a['address line 1'], 'addressSection_addressLine1'),
+        text_field('City', a['address city'], 'addressSection_city'),
+        select_field('State', a['address state'], 'addressSection_countryRegion', us_states),
+        text_field('Postal Code', a['address postal code'], 'addressSection_postalCode'),
+        text_field('Email Address', a['email'], 'email'),
+        select_field('Phone Device Type', a['phone device type'], 'phone-device-type', ['Landline', 'Mobile']),
+        text_field('Phone Number', a['telephone number'], 'phone-number'),
+    ])
+    experience = ''
+    for i in range(n_jobs):
+        place = places[i]
+        start_key = 'first work experience start date (from)' if i == 0 else f'{place} work experience start date'
+        from_month = a['second date from month'] if i == 1 else a[f'{place} work from month']
+        from_year = a['second date from year'] if i == 1 else a[f'{place} work from year']
+        experience += section(f'Work Experience {i+1}', ''.join([
+            text_field('Job Title', a[f'{place} work experience job title / position'], f'jobTitle-{i}'),
+            text_field('Company', a[f'{place} work experience company'], f'company-{i}'),
+            text_field('Location', '', f'location-{i}'),
+            select_field('From Month', from_month, f'startDate-month-{i}', months),
+            text_field('From Year', from_year, f'startDate-year-{i}'),
+            select_field('To Month', a[f'{place} work to month'], f'endDate-month-{i}', months),
+            text_field('To Year', a[f'{place} work to year'], f'endDate-year-{i}'),
+            text_field('Role Description', a[f'{place} work experience description'], f'description-{i}', tag='textarea'),
+        ])) + f'<input type="checkbox" name="currentlyWorkHere-{i}" id="currentlyWorkHere-{i}"><label for="currentlyWorkHere-{i}">I currently work here</label>'
+    education = ''
+    for i, place in enumerate(['first', 'second']):
+        field_key = f'{place} education field of study/concentration/major' if i == 0 else 'second education first field of study/concentration/major'
+        education += section(f'Education {i+1}', ''.join([
+            text_field('School or University', a[f'{place} education university'], f'school-{i}'),
+            select_field('Degree', a[f'{place} education degree'], f'degree-{i}', ["High School", "Associate's Degree", "Bachelor's Degree", "Master's Degree", 'Doctorate']),
+            text_field('Field of Study', a[field_key], f'fieldOfStudy-{i}'),
+            text_field('Overall Result (GPA)', a[f'{place} education GPA'], f'gpa-{i}'),
+            text_field('From', a[f'{place} education from'], f'firstYearAttended-{i}'),
+            text_field('To (Actual or Expected)', a[f'{place} education to'], f'lastYearAttended-{i}'),
+        ]))
+    links = section('Websites', text_field('LinkedIn', a['first link: linkedin'], 'linkedinQuestion') + text_field('URL', a['second link: github'], 'website-0'))
+    questions = section('Application Questions', ''.join([
+        select_field('Are you legally authorized to work in the country in which the job is located?', a['are you legally authorized to work in the united states?'], 'q-auth', ['Yes', 'No']),
+        select_field('Will you now, or in the future, require sponsorship for employment visa status?', a['will you require sponsorship for work authorization in the united states?'], 'q-sponsor', ['Yes', 'No']),
+        text_field('Skills', a['skills'], 'skills', tag='textarea'),
+    ]))
+    disclosures = section('Voluntary Disclosures', ''.join([
+        select_field('Gender', a['gender'], 'gender', ['Male', 'Female', 'Decline to self-identify']),
+        select_field('Ethnicity', a['race'], 'ethnicity', ['Hispanic or Latino', 'White', 'Asian', 'Decline to self-identify']),
+        select_field('Veteran Status', a['veteran status'], 'veteranStatus', ['I am a protected veteran', 'I am not a protected veteran', 'I do not wish to self-identify']),
+    ]))
+    # what makes real workday pages heavy: state and tracking inputs the user never sees
+    noise = ''.join(f'<input type="hidden" name="wd-state-{i}" value="{i}">' for i in range(n_hidden))
+    noise += ''.join(f'<div style="display:none"><label>Legacy field {i}</label><input type="text" name="legacy-{i}"></div>' for i in range(n_hidden // 4))
+    body = ('<div data-automation-id="applyFlowPage"><h2>My Information</h2><form>' + section('Legal Name and Contact', my_info)
+            + '<h2>My Experience</h2>' + experience + education + links + '<h2>Application Questions</h2>' + questions + disclosures + noise + '</form></div>')
+    return page('Workday application', body)
+
+
+def make_corpus():
+    '''return {path: html} of every synthetic form page'''
+    a = persona_answers()
+    return {'/greenhouse': greenhouse_page(a), '/lever': lever_page(a), '/workday': workday_page(a)}
@@ -0,0 +1,42 @@
+'''synthetic indeed-like search, description and apply redirect pages'''
+import random
+
+
+def description_page(jk: str, words=200, apply_link=True):
+    rng = random.Random(jk) # every job gets its own distinct description
+    body = ' '.join('responsibility%d' % rng.randrange(5000) for _ in range(words))
+    # jobs applied to on indeed (easy apply) have no link to a company site
+    apply = f'<div id="applyButtonLinkContainer"><button href="/applystart?jk={jk}">Apply on company site</button></div>' if apply_link \
+        else '<div id="indeedApplyButton"><button>Apply now</button></div>'
+    return f'''<html><body><nav>Home Jobs Companies Salaries</nav>
+<h1>Job {jk}</h1><div id="jobDescriptionText"><p>Job {jk}: {body}</p></div>
+{apply}
+<footer>© Indeed</footer></body></html>'''
+
+
+def search_page(jks: list[str], next_page: str=None):
+    links = ''.join(f'<li><a class="jcs-JobTitle" href="/viewjob?jk={jk}">Job {jk}</a></li>' for jk in jks)
+    nav = f'<nav><a data-testid="pagination-page-next" aria-label="Next Page" href="{next_page}">Next</a></nav>' if next_page else ''
+    return f'<html><body><ul>{links}</ul>{nav}</body></html>'
+
+
+def make_site(n_searches=4, jobs_per_search=10, pages_per_search=1, easy_apply_every=0):
+    '''
+    return (pages, search_paths) for FixtureServer: every search page lists jobs_per_search jobs and links to its next page,
+    description pages link to an apply redirect that lands on a company portal page,
+    except one job in easy_apply_every (none if 0) which has no apply link, its apply url is then its description page's
+    '''
+    pages, search_paths, jk = {}, [], 0
+    for s in range(n_searches):
+        for p in range(pages_per_search):
+            path = f'/jobs?q=search{s}' + (f'&start={p*10}' if p else '')
+            if not p:
+                search_paths.append(path)
+            jks = [str(jk + i) for i in range(jobs_per_search)]
+            jk += jobs_per_search
+            pages[path] = search_page(jks, f'/jobs?q=search{s}&start={(p+1)*10}' if p + 1 < pages_per_search else None)
+            for j in jks:
+                pages[f'/viewjob?jk={j}'] = description_page(j, apply_link=not easy_apply_every or int(j) % easy_apply_every)
+                pages[f'/applystart?jk={j}'] = ('redirect', f'/portal/{j}')
+                pages[f'/portal/{j}'] = f'<html><body><form><label>email</label><input name="email"></form></body></html>'
+    return pages, search_paths
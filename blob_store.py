@@ -0,0 +1,134 @@
+import copy
+import fcntl
+import hashlib
+import os
+import struct
+import threading
+import zlib
+
+
+header = struct.Struct('>16sI') # digest of the text, length of the compressed data
+
+
+def content_key(text: str):
+    '''return the content address of text in a BlobStore, the hex digest of its content'''
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class BlobStore():
+    '''
+    Content-addressed store of compressed texts (job descriptions), appended to a single pack file.
+    Each distinct text is stored once and referenced by the hex digest of its content
+    '''
+
+    def __init__(self, path: str, level=9) -> None:
+        '''
+        Parameters
+        ----------
+        path : str
+            pack file of the store, created on first put
+        level : int, default 9
+            zlib compression level
+        '''
+        self.path = path
+        self.level = level
+        self.offsets = None # digest: (offset, length) of its compressed text, read on first use
+        self.lock = threading.Lock()
+
+    def key(self, text: str):
+        '''return the content address of text'''
+        return content_key(text)
+
+    def load(self):
+        '''read the offsets of the texts appended to the pack file since it was last read, stopping at a text cut short by an interrupted write'''
+        if self.offsets is None:
+            self.offsets, self.size = {}, 0
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            self.scan(f)
+
+    def scan(self, f):
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size < self.size: # the pack was replaced, read it from the start
+            self.offsets, self.size = {}, 0
+        f.seek(self.size)
+        while True:
+            head = f.read(header.size)
+            if len(head) < header.size:
+                break
+            digest, length = header.unpack(head)
+            offset = self.size + header.size
+            if offset + length > file_size:
+                break
+            self.offsets[digest.hex()] = (offset, length)
+            self.size = offset + length
+            f.seek(self.size)
+
+    def put(self, text: str):
+        '''store text if it isn't already, return its key'''
+        key = self.key(text)
+        with self.lock:
+            if self.offsets is None:
+                self.load()
+            if key not in self.offsets:
+                data = zlib.compress(text.encode('utf-8'), self.level)
+                with open(self.path, 'a+b') as f:
+                    # other processes may append to the same pack, writes are serialized by the lock and start at its real end
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    self.scan(f)
+                    if key not in self.offsets:
+                        # anything after the last complete text was left by a write interrupted while holding the lock
+                        if os.fstat(f.fileno()).st_size > self.size:
+                            f.truncate(self.size)
+                        f.write(header.pack(bytes.fromhex(key), len(data)) + data)
+                        f.flush()
+                        self.offsets[key] = (self.size + header.size, len(data))
+                        self.size += header.size + len(data)
+        return key
+
+    def get(self, key: str):
+        '''return the text stored under key, KeyError if there is none'''
+        with self.lock:
+            if self.offsets is None or key not in self.offsets: # may have been stored by another process since
+                self.load()
+            offset, length = self.offsets[key]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length)).decode('utf-8')
+
+
+class LazyJob(dict):
+    '''
+    job record whose description is stored in a BlobStore and referenced by its description_hash,
+    the description is only read from the store the first time it is accessed
+    '''
+
+    def __init__(self, record: dict, blobs: BlobStore) -> None:
+        super().__init__(record)
+        self.blobs = blobs
+
+    def __missing__(self, key):
+        if key == 'description' and dict.__contains__(self, 'description_hash'):
+            self['description'] = self.blobs.get(dict.__getitem__(self, 'description_hash'))
+            return self['description']
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or (key == 'description' and dict.__contains__(self, 'description_hash'))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __copy__(self):
+        return LazyJob(self, self.blobs)
+
+    def __deepcopy__(self, memo):
+        return LazyJob(copy.deepcopy(dict(self), memo), self.blobs) # the store is shared, not copied
+
+    def __reduce__(self): # pickled as a plain job dict, with its description
+        self.get('description')
+        return (dict, (dict(self),))
@@ -0,0 +1,280 @@
+'''
+matching daemon: holds the sbert model and the form answers once for every browser session on the machine.
+Sessions create AutoApply(matcher=address) and drive their own selenium driver, their form answer and dropdown matching
+is sent to the daemon, which encodes the requests arriving within a short window together in one model call
+
+run with: python daemon.py [folder_name] [--address /tmp/auto_apply.sock | localhost:8765] [--window .01]
+'''
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+default_address = '/tmp/auto_apply.sock'
+
+
+def is_unix_address(address: str):
+    return address.startswith('unix:') or address.startswith('/') or address.startswith('.')
+
+
+def unix_path(address: str):
+    return address[len('unix:'):] if address.startswith('unix:') else address
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout=60) -> None:
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class RemoteMatcher():
+    '''client of a matching daemon, with the matching methods of AutoApply'''
+
+    def __init__(self, address=default_address, timeout=60) -> None:
+        '''
+        Parameters
+        ----------
+        address : str, default default_address
+            unix socket path (optionally prefixed with 'unix:') or host:port of the daemon
+        timeout : float, default 60
+            seconds to wait for an answer
+        '''
+        self.address = address
+        self.timeout = timeout
+
+    def connect(self):
+        if is_unix_address(self.address):
+            return UnixHTTPConnection(unix_path(self.address), self.timeout)
+        host, port = self.address.removeprefix('http://').rsplit(':', 1)
+        return http.client.HTTPConnection(host, int(port), timeout=self.timeout)
+
+    def call(self, method: str, params: dict):
+        connection = self.connect()
+        try:
+            connection.request('POST', '/'+method, json.dumps(params), {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            body = json.loads(response.read())
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise RuntimeError('matching daemon error: '+str(body.get('error')))
+        return body['result']
+
+    def get_form_answers(self, contexts: list[str], form_els: list[str], assign=True):
+        '''same as AutoApply.get_form_answers()'''
+        return self.call('get_form_answers', {'contexts': contexts, 'form_els': form_els, 'assign': assign})
+
+    def get_best_options(self, option_texts: list[list[str]], contexts: list[str], form_els: list[str]):
+        '''return the index of the best option of each dropdown, see AutoApply.get_best_options()'''
+        return self.call('get_best_options', {'options': option_texts, 'contexts': contexts, 'form_els': form_els})
+
+
+class NoBrowser():
+    '''the daemon's AutoApply never drives a browser'''
+    def close(self): pass
+    def quit(self): pass
+
+
+def validate_request(method: str, params: dict):
+    '''raise ValueError if a request is not a call the daemon can answer, so it isn't batched with the others'''
+    if method not in ['get_form_answers', 'get_best_options']:
+        raise ValueError('unknown method '+method)
+    if not isinstance(params, dict):
+        raise ValueError('parameters should be a json object')
+    strings = lambda value: isinstance(value, list) and all(isinstance(t, str) for t in value)
+    if not strings(params.get('contexts')) or not strings(params.get('form_els')):
+        raise ValueError('contexts and form_els should be lists of strings')
+    if len(params['contexts']) != len(params['form_els']):
+        raise ValueError('every element needs a context and a string')
+    if method == 'get_best_options':
+        if not isinstance(params.get('options'), list) or not all(strings(options) for options in params['options']):
+            raise ValueError('options should be a list of lists of strings')
+        if len(params['options']) != len(params['contexts']):
+            raise ValueError('every dropdown needs a context, a string and options')
+    elif not isinstance(params.get('assign', True), bool):
+        raise ValueError('assign should be a boolean')
+
+
+class MatchDaemon():
+    '''
+    Serves the matching methods of one AutoApply to many sessions over HTTP on a unix socket or a TCP port.
+    Requests are queued and handled by a single thread: every request arriving within window seconds of the first one
+    is encoded in one model call, then matched on its own
+    '''
+
+    def __init__(self, folder_name='file_templates/', address=default_address, window=.01, max_batch=64, **kwargs) -> None:
+        '''
+        Parameters
+        ----------
+        folder_name : str, default 'file_templates/'
+            folder containing form_answers.json, as for AutoApply
+        address : str, default default_address
+            unix socket path (optionally prefixed with 'unix:') or host:port to listen on
+        window : float, default .01
+            seconds to wait for more requests after the first one of a batch
+        max_batch : int, default 64
+            maximum number of requests per batch
+        kwargs
+            other arguments of AutoApply, e.g. encoder
+        '''
+        from auto_apply import AutoApply # imported here, auto_apply imports this module for RemoteMatcher
+        self.app = AutoApply(folder_name, driver=NoBrowser(), **kwargs)
+        self.address = address
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+
+    def make_server(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                method = self.path.strip('/')
+                try:
+                    params = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    validate_request(method, params)
+                except (ValueError, KeyError, TypeError) as e:
+                    return self.reply(400, {'error': str(e)})
+                future = Future()
+                daemon.requests.put((method, params, future))
+                try:
+                    self.reply(200, {'result': future.result()})
+                except Exception as e:
+                    self.reply(500, {'error': repr(e)})
+
+            def reply(self, status: int, body: dict):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        if is_unix_address(self.address):
+            class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+                daemon_threads = True
+                def get_request(self): # unix sockets have no client address, BaseHTTPRequestHandler expects one
+                    request, _ = super().get_request()
+                    return request, ('local', 0)
+            path = unix_path(self.address)
+            try: # remove the socket left behind by a previous daemon, unless it is still running
+                with socket.socket(socket.AF_UNIX) as probe:
+                    probe.connect(path)
+                raise OSError('a daemon is already listening on '+path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if os.path.exists(path):
+                    os.remove(path)
+            return UnixHTTPServer(path, Handler)
+        host, port = self.address.removeprefix('http://').rsplit(':', 1)
+        return ThreadingHTTPServer((host, int(port)), Handler)
+
+    def next_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.window
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def process(self, batch: list[tuple]):
+        '''answer a batch of requests, with one model call for the text of them all and one for the dropdown options'''
+        app = self.app
+        with app.metrics.run('daemon_batch', requests=len(batch)):
+            texts = [t for _, params, _ in batch for t in params['contexts'] + params['form_els']]
+            embs = app.sbert.encode(app.strip_unks(texts)) if texts else None
+            app.metrics.record('encode_batch_sizes', len(texts))
+            answers_list, start = [], 0
+            for method, params, _ in batch:
+                n = len(params['contexts'])
+                if n:
+                    assign = params.get('assign', True) if method == 'get_form_answers' else False
+                    answers_list.append(app.match_answers(embs[start:start+n], embs[start+n:start+2*n], assign))
+                else:
+                    answers_list.append([])
+                start += 2*n
+            # answers and options of every dropdown of every request embedded in one call, then read from the cache
+            option_texts = [t for (method, params, _), answers in zip(batch, answers_list) if method == 'get_best_options'
+                            for t in answers + [o for options in params['options'] for o in options]]
+            if option_texts:
+                app.encode_cached(option_texts)
+            for (method, params, future), answers in zip(batch, answers_list):
+                future.set_result(answers if method == 'get_form_answers' else app.best_option_indexes(answers, params['options']))
+
+    def work(self):
+        while True:
+            batch = self.next_batch()
+            stop = batch[-1] is None
+            batch = [r for r in batch if r is not None]
+            try:
+                if batch:
+                    self.process(batch)
+            except Exception as e:
+                print('Warning: matching a batch of', len(batch), 'requests resulted in:')
+                print(e)
+                pending = [r for r in batch if not r[2].done()]
+                if len(pending) == 1:
+                    pending[0][2].set_exception(e)
+                    pending = []
+                for request in pending: # retried on their own, so only the request that failed gets the error
+                    try:
+                        self.process([request])
+                    except Exception as request_e:
+                        if not request[2].done():
+                            request[2].set_exception(request_e)
+            if stop:
+                return
+
+    def serve_forever(self):
+        '''load the model and answers, then serve requests until interrupted'''
+        self.app.wait_until_ready()
+        worker = threading.Thread(target=self.work, daemon=True)
+        worker.start()
+        self.server = self.make_server()
+        print('matching daemon listening on', self.address)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.requests.put(None)
+            worker.join()
+            if is_unix_address(self.address) and os.path.exists(unix_path(self.address)):
+                os.remove(unix_path(self.address))
+
+    def shutdown(self):
+        '''stop serve_forever() from another thread'''
+        self.server.shutdown()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('folder_name', nargs='?', default='file_templates/')
+    parser.add_argument('--address', default=default_address, help='unix socket path or host:port')
+    parser.add_argument('--window', type=float, default=.01, help='seconds to wait for more requests to batch with the first one')
+    parser.add_argument('--encoder', default='torch', help="'torch', 'onnx' or 'onnx-int8'")
+    args = parser.parse_args()
+    folder_name = args.folder_name if args.folder_name.endswith('/') else args.folder_name+'/'
+    try:
+        MatchDaemon(folder_name, args.address, args.window, encoder=args.encoder).serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+class EmbeddingStore():
+    '''
+    Content-addressed on-disk cache of sentence embeddings,
+    rows are kept in a memory-mapped .npy file and looked up by a hash of model name + text
+    '''
+
+    def __init__(self, path: str, model_name: str) -> None:
+        '''
+        Parameters
+        ----------
+        path : str
+            path prefix of the store, '.npy' and '.json' are appended to it for the array and index files
+        model_name : str
+            name of the model producing the embeddings, part of every key so switching model never reuses stale rows
+        '''
+        self.model_name = model_name
+        self.array_filename = path+'.npy'
+        self.index_filename = path+'.json'
+        self.index = {}
+        self.embs = None
+        if os.path.exists(self.index_filename) and os.path.exists(self.array_filename):
+            try:
+                with open(self.index_filename) as f:
+                    self.index = json.load(f)
+                self.embs = np.load(self.array_filename, mmap_mode='r')
+            except (ValueError, OSError): # corrupt store, start over
+                self.index, self.embs = {}, None
+            if self.embs is not None and len(self.index) and max(self.index.values()) >= len(self.embs):
+                self.index, self.embs = {}, None
+
+    def key(self, text: str):
+        '''return the content address of text for this store's model'''
+        return hashlib.sha1((self.model_name+'\0'+text).encode('utf-8')).hexdigest()
+
+    def encode(self, texts: list[str], encoder):
+        '''
+        return embeddings of texts, only calling encoder on texts missing from the store
+
+            Parameters
+            ----------
+            texts : list[str]
+                texts to embed
+            encoder : callable
+                takes a list of str and returns a 2d array of embeddings, e.g. SentenceTransformer.encode
+
+            Returns
+            -------
+            numpy.ndarray
+                one embedding row per text, in the order of texts
+        '''
+        keys = [self.key(t) for t in texts]
+        missing = list(dict.fromkeys(k for k in keys if k not in self.index))
+        if missing:
+            missing_texts = {k: t for k, t in zip(keys, texts)}
+            self.add(missing, np.asarray(encoder([missing_texts[k] for k in missing])))
+        if not keys:
+            return np.empty((0, 0 if self.embs is None else self.embs.shape[1]), dtype=np.float32)
+        return np.array(self.embs[[self.index[k] for k in keys]])
+
+    def add(self, keys: list[str], embs: np.ndarray):
+        '''append rows to the array file and persist the index'''
+        old = np.empty((0, embs.shape[1]), dtype=embs.dtype) if self.embs is None else self.embs
+        if old.shape[1] != embs.shape[1]: # embedding size changed, stored rows are useless
+            old, self.index = np.empty((0, embs.shape[1]), dtype=embs.dtype), {}
+        start = len(old)
+        # write to temporary files then swap, so an interrupted write never leaves index and array out of sync
+        tmp = np.lib.format.open_memmap(self.array_filename+'.tmp', mode='w+', dtype=embs.dtype, shape=(start+len(embs), embs.shape[1]))
+        tmp[:start] = old
+        tmp[start:] = embs
+        tmp.flush()
+        del tmp, old
+        self.embs = None
+        os.replace(self.array_filename+'.tmp', self.array_filename)
+        self.index.update({k: start+i for i, k in enumerate(keys)})
+        with open(self.index_filename+'.tmp', 'w') as f:
+            json.dump(self.index, f)
+        os.replace(self.index_filename+'.tmp', self.index_filename)
+        self.embs = np.load(self.array_filename, mmap_mode='r')
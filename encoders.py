@@ -0,0 +1,170 @@
+import json
+import os
+
+import numpy as np
+
+
+encoder_backends = ['torch', 'onnx', 'onnx-int8']
+
+
+def encoder_name(backend: str, model_name: str):
+    '''return the name identifying the embeddings of a model run by a backend, known before the model is loaded'''
+    return model_name if backend == 'torch' else model_name+':'+backend # torch embeddings cached before backends existed stay valid
+
+
+class TorchEncoder():
+    '''the sentence-transformers model run by pytorch in fp32, the reference the other backends are measured against'''
+
+    def __init__(self, model_name: str, threads: int=None) -> None:
+        '''
+        Parameters
+        ----------
+        model_name : str
+            sentence-transformers model name
+        threads : int, default None
+            number of threads pytorch computes with, None for its default (one per core).
+            This is process wide, it changes the threads of every pytorch model
+        '''
+        # imported here as importing sentence_transformers alone takes seconds
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+        self.tokenizer = self.model.tokenizer
+        self.name = encoder_name('torch', model_name)
+
+    def encode(self, texts: list[str]):
+        '''return the embeddings of texts, one row per text'''
+        return np.asarray(self.model.encode(texts))
+
+
+class OnnxEncoder():
+    '''
+    the same model exported to ONNX and run by onnxruntime, optionally with its weights dynamically quantized to int8.
+    The export needs pytorch and is done once, then the model is loaded from export_folder with only onnxruntime and the tokenizer
+    '''
+
+    def __init__(self, model_name: str, export_folder: str, quantize=False, threads: int=None, batch_size=32) -> None:
+        '''
+        Parameters
+        ----------
+        model_name : str
+            sentence-transformers model name
+        export_folder : str
+            folder the exported model is kept in, one subfolder per model
+        quantize : bool, default False
+            if True, run the model with int8 weights: smaller and faster on CPU, embeddings differ slightly from fp32
+        threads : int, default None
+            number of threads onnxruntime computes with, None for its default (one per physical core)
+        batch_size : int, default 32
+            texts encoded per model run
+        '''
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        self.folder = os.path.join(export_folder, model_name.replace('/', '__'))
+        self.model_path = os.path.join(self.folder, 'model.onnx')
+        self.quantized_path = os.path.join(self.folder, 'model.int8.onnx')
+        self.config_path = os.path.join(self.folder, 'encoder.json')
+        if not os.path.exists(self.config_path):
+            self.export(model_name)
+        if quantize and not os.path.exists(self.quantized_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(self.model_path, self.quantized_path+'.tmp', weight_type=QuantType.QInt8)
+            os.replace(self.quantized_path+'.tmp', self.quantized_path)
+        with open(self.config_path) as f:
+            self.config = json.load(f)
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.quantized_path if quantize else self.model_path, options, providers=['CPUExecutionProvider'])
+        self.tokenizer = AutoTokenizer.from_pretrained(self.folder)
+        self.batch_size = batch_size
+        self.name = encoder_name('onnx-int8' if quantize else 'onnx', model_name)
+
+    def export(self, model_name: str):
+        '''export the transformer of a sentence-transformers model to ONNX, along with its tokenizer and pooling configuration'''
+        import torch
+        from sentence_transformers import SentenceTransformer
+        sbert = SentenceTransformer(model_name, device='cpu')
+        transformer = sbert[0].auto_model.eval()
+
+        class TokenEmbeddings(torch.nn.Module):
+            def __init__(self) -> None:
+                super().__init__()
+                self.transformer = transformer
+
+            def forward(self, input_ids, attention_mask):
+                return self.transformer(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+        os.makedirs(self.folder, exist_ok=True)
+        sbert.tokenizer.save_pretrained(self.folder)
+        example = sbert.tokenizer(['an example sentence', 'another one'], padding=True, return_tensors='pt')
+        with torch.no_grad():
+            torch.onnx.export(TokenEmbeddings(), (example['input_ids'], example['attention_mask']), self.model_path+'.tmp',
+                              input_names=['input_ids', 'attention_mask'], output_names=['token_embeddings'],
+                              dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'}, 'attention_mask': {0: 'batch', 1: 'sequence'}, 'token_embeddings': {0: 'batch', 1: 'sequence'}},
+                              opset_version=14)
+        os.replace(self.model_path+'.tmp', self.model_path)
+        pooling = sbert[1]
+        config = {
+            'model_name': model_name,
+            'pooling': 'cls' if pooling.pooling_mode_cls_token else 'max' if pooling.pooling_mode_max_tokens else 'mean',
+            'normalize': any(type(module).__name__ == 'Normalize' for module in sbert),
+            'max_seq_length': sbert.max_seq_length,
+        }
+        with open(self.config_path, 'w') as f: # written last, marks a complete export
+            json.dump(config, f)
+
+    def encode(self, texts: list[str]):
+        '''return the embeddings of texts, one row per text'''
+        texts = list(texts)
+        order = np.argsort([-len(t) for t in texts], kind='stable') # texts of similar length are batched together, less padding
+        embs = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = self.tokenizer([texts[i] for i in order[start:start+self.batch_size]], padding=True, truncation=True,
+                                   max_length=self.config['max_seq_length'], return_tensors='np')
+            mask = batch['attention_mask'].astype(np.int64)
+            tokens = self.session.run(None, {'input_ids': batch['input_ids'].astype(np.int64), 'attention_mask': mask})[0]
+            if self.config['pooling'] == 'cls':
+                pooled = tokens[:, 0]
+            elif self.config['pooling'] == 'max':
+                pooled = np.where(mask[..., None] > 0, tokens, -1e9).max(axis=1)
+            else:
+                pooled = (tokens * mask[..., None]).sum(axis=1) / np.clip(mask.sum(axis=1, keepdims=True), 1e-9, None)
+            if self.config['normalize']:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embs.append(pooled.astype(np.float32))
+        if not embs:
+            return np.empty((0, 0), dtype=np.float32)
+        embs = np.concatenate(embs)
+        unsorted = np.empty_like(embs)
+        unsorted[order] = embs
+        return unsorted
+
+
+def make_encoder(backend: str, model_name: str, export_folder: str, threads: int=None):
+    '''
+    return a sentence encoder, all backends have a tokenizer, a name identifying their embeddings and an encode(texts) method
+
+        Parameters
+        ----------
+        backend : str
+            'torch' for the sentence-transformers model, 'onnx' for its ONNX export, 'onnx-int8' for the export with int8 weights
+        model_name : str
+            sentence-transformers model name
+        export_folder : str
+            folder ONNX exports are kept in
+        threads : int, default None
+            number of threads the backend computes with, None for its default
+
+        Returns
+        -------
+        TorchEncoder or OnnxEncoder
+    '''
+    if backend == 'torch':
+        return TorchEncoder(model_name, threads)
+    if backend in ['onnx', 'onnx-int8']:
+        return OnnxEncoder(model_name, export_folder, backend == 'onnx-int8', threads)
+    raise ValueError('unknown encoder backend '+repr(backend)+', expected one of '+str(encoder_backends))
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import bs4
+
+
+def normalize_label(text: str):
+    '''lowercase, digits replaced by #, whitespace collapsed: labels and ids that only differ by a counter or spacing are the same'''
+    return re.sub(r'\s+', ' ', re.sub(r'\d+', '#', text.lower())).strip()
+
+
+class FormCache():
+    '''
+    Persistent cache of the answers given to whole forms, keyed by a structural fingerprint of the form:
+    every usable control's tag, type, id, name and normalized label, along with a hash of the form answers they were matched to.
+    Forms of the same portal software are structurally identical from one job to the next, so their answers can be replayed without the model
+    '''
+
+    def __init__(self, path: str, max_forms=1000) -> None:
+        '''
+        Parameters
+        ----------
+        path : str
+            json file the cache is kept in
+        max_forms : int, default 1000
+            number of forms kept, the least recently stored are dropped first
+        '''
+        self.path = path
+        self.max_forms = max_forms
+        self.forms = None # loaded on first use
+        self.lock = threading.Lock() # shared by the sessions of an ApplyQueue
+
+    def load(self):
+        if self.forms is None:
+            self.forms = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path) as f:
+                        self.forms = json.load(f)
+                except ValueError: # corrupt cache, start over
+                    pass
+
+    def element_keys(self, elements: list[bs4.element.Tag], labels: list[str]):
+        '''
+        return a key per form control identifying it within its form, controls that would get the same key are told apart by their order
+
+            Parameters
+            ----------
+            elements : list[bs4.element.Tag]
+                the form's controls, in document order
+            labels : list[str]
+                text surrounding each control, e.g. from AutoApply.get_surrounding_text()
+
+            Returns
+            -------
+            list[str]
+        '''
+        keys, seen = [], {}
+        for el, label in zip(elements, labels):
+            key = json.dumps([el.name, el.get('type', ''), normalize_label(el.get('id', '')), normalize_label(el.get('name', '')), normalize_label(label)])
+            seen[key] = seen.get(key, 0) + 1
+            keys.append(key+'#'+str(seen[key]))
+        return keys
+
+    def form_key(self, element_keys: list[str], answers_hash: str):
+        '''return the fingerprint of a form from the keys of its controls and the hash of the answers it is filled with'''
+        return hashlib.blake2b('\n'.join([answers_hash]+element_keys).encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, form_key: str):
+        '''return the {element key: answer} mapping stored for a form, None if it was never stored'''
+        with self.lock:
+            self.load()
+            return self.forms.get(form_key)
+
+    def put(self, form_key: str, mapping: dict):
+        '''store the {element key: answer} mapping of a form, an answer being the text input or the text of the option selected'''
+        with self.lock:
+            self.load()
+            self.forms.pop(form_key, None) # most recently stored last
+            self.forms[form_key] = mapping
+            while len(self.forms) > self.max_forms:
+                del self.forms[next(iter(self.forms))]
+            with open(self.path+'.tmp', 'w') as f:
+                json.dump(self.forms, f)
+            os.replace(self.path+'.tmp', self.path)
@@ -0,0 +1,216 @@
+import json
+import os
+import re
+from urllib.parse import urlparse
+
+from seen_index import parse_seen_date
+from storage import description_key, job_kinds
+from utils import url_key
+
+
+date_columns = ['date_scraped', 'date_seen', 'date_applied']
+periods = ['day', 'week', 'month', 'quarter', 'year']
+part_pattern = re.compile(rf"({'|'.join(job_kinds)})-\d+-\d+\.parquet(\.tmp)?") # names of the part files, other files in the folder are left alone
+export_version = 2 # parts written by another version are rebuilt
+
+
+def history_schema():
+    # imported here as pyarrow is only needed to export and query the history
+    import pyarrow as pa
+    return pa.schema([('search_url', pa.string()), ('apply_host', pa.string()), ('ats_domain', pa.string()),
+                      ('apply_url_key', pa.uint64()), ('description_key', pa.uint64())] + [(c, pa.timestamp('us')) for c in date_columns])
+
+
+def ats_domain(host: str):
+    '''return the domain of the applicant tracking system an apply url is hosted on, e.g. myworkdayjobs.com for acme.wd5.myworkdayjobs.com'''
+    return '.'.join(host.split('.')[-2:])
+
+
+def to_row(job: dict):
+    '''return the columns of the history export of a storage record'''
+    host = urlparse(job['apply_url']).netloc.lower() if job.get('apply_url') else None
+    dates = [parse_seen_date(job.get(c)) for c in date_columns]
+    return [job.get('search_url'), host, ats_domain(host) if host else None,
+            url_key(job['apply_url']) if job.get('apply_url') else None, description_key(job)] + dates
+
+
+class HistoryExport():
+    '''
+    Columnar mirror of the job history in Parquet files, one set of part files per kind of record (scraped, seen, applied).
+    Only the fields analyses group and count by are kept, with dates as timestamps, not descriptions.
+    Records stored since the last sync are appended as a new part file the next time the export is used,
+    and queries run on the Arrow tables of the parts, loaded once
+    '''
+
+    def __init__(self, storage, export_path: str, max_parts=32) -> None:
+        '''
+        Parameters
+        ----------
+        storage : JsonlStorage or SqliteStorage
+            job history the export mirrors
+        export_path : str
+            path of the folder of the part files, '.json' is appended to it for the metadata
+        max_parts : int, default 32
+            the parts of a kind are merged into one once there are more than this many
+        '''
+        self.storage = storage
+        self.folder = export_path
+        self.meta_path = export_path+'.json'
+        self.max_parts = max_parts
+        self.meta = None # kind: cursor, source and part files, loaded on first use
+        self.tables = {} # kind: pyarrow.Table of its parts
+
+    def load_meta(self):
+        self.meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        os.makedirs(self.folder, exist_ok=True)
+        parts = {p for state in self.meta.values() for p in state['parts']}
+        for filename in os.listdir(self.folder): # written by a sync interrupted before saving the metadata
+            if filename not in parts and part_pattern.fullmatch(filename):
+                self.remove_part(filename)
+
+    def save_meta(self):
+        with open(self.meta_path+'.tmp', 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(self.meta_path+'.tmp', self.meta_path)
+
+    def write_part(self, table, filename: str):
+        import pyarrow.parquet as pq
+        path = os.path.join(self.folder, filename)
+        pq.write_table(table, path+'.tmp', compression='zstd')
+        os.replace(path+'.tmp', path)
+
+    def remove_part(self, filename: str):
+        path = os.path.join(self.folder, filename)
+        if os.path.exists(path): # may have been removed by another export of the same history
+            os.remove(path)
+
+    def sync(self, kind: str=None):
+        '''append the records stored since the last sync to the export, of one kind or of every kind if None'''
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self.meta is None:
+            self.load_meta()
+        for kind in [kind] if kind else job_kinds:
+            source = self.storage.source(kind)
+            state = self.meta.get(kind)
+            if state is None or state['source'] != source or state.get('version') != export_version \
+                    or not self.storage.cursor_valid(kind, state['cursor'], state.get('fingerprint')): # start over
+                for filename in state['parts'] if state else []:
+                    self.remove_part(filename)
+                state = self.meta[kind] = {'cursor': 0, 'source': source, 'parts': [], 'version': export_version}
+                self.tables.pop(kind, None)
+            if kind not in self.tables:
+                parts = [pq.read_table(os.path.join(self.folder, p), schema=history_schema()) for p in state['parts']]
+                self.tables[kind] = pa.concat_tables(parts) if parts else history_schema().empty_table()
+
+            rows, cursor = [], state['cursor']
+            for job, cursor in self.storage.iter_records(kind, state['cursor']):
+                rows.append(to_row(job))
+            if cursor == state['cursor']:
+                continue
+            new = pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(zip(*rows), history_schema())], schema=history_schema()) \
+                if rows else history_schema().empty_table()
+            self.tables[kind] = pa.concat_tables([self.tables[kind], new])
+            filename = f"{kind}-{state['cursor']}-{cursor}.parquet"
+            self.write_part(new, filename)
+            state['parts'].append(filename)
+            state['cursor'], state['fingerprint'] = cursor, self.storage.fingerprint(kind, cursor)
+            old_parts = state['parts']
+            if len(old_parts) > self.max_parts: # fewer, bigger files load faster
+                state['parts'] = [f'{kind}-0-{cursor}.parquet']
+                self.write_part(self.tables[kind], state['parts'][0])
+            self.save_meta()
+            for filename in set(old_parts) - set(state['parts']):
+                self.remove_part(filename)
+
+    def table(self, kind: str, columns: list[str]=None):
+        '''
+        return the export of the records of a kind, synced first
+
+            Parameters
+            ----------
+            kind : str
+                'scraped', 'seen' or 'applied'
+            columns : list[str], default None
+                columns to return, all if None: search_url, apply_host, ats_domain, apply_url_key, description_key, date_scraped, date_seen, date_applied
+
+            Returns
+            -------
+            pyarrow.Table
+                one row per record, .to_pandas() converts it to a DataFrame
+        '''
+        self.sync(kind)
+        return self.tables[kind].select(columns) if columns else self.tables[kind]
+
+    def filter_since(self, table, date_column: str, since):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        if since is None:
+            return table
+        return table.filter(pc.greater_equal(table[date_column], pa.scalar(since, pa.timestamp('us'))))
+
+    def counts(self, kind: str, by: list[str]=None, period: str=None, since=None, distinct=False):
+        '''
+        count the records of a kind per value of some columns and/or per period of their date
+
+            Parameters
+            ----------
+            kind : str
+                'scraped', 'seen' or 'applied'
+            by : list[str], default None
+                columns to group by, e.g. ['search_url'] or ['ats_domain']
+            period : str, default None
+                if given, also group by period of the record's date ('date_'+kind): 'day', 'week' (starting on mondays), 'month', 'quarter' or 'year'
+            since : datetime.datetime, default None
+                if given, only count the records dated from then on
+            distinct : bool, default False
+                if True, count distinct jobs (by apply url) instead of records, e.g. a job scraped from several searches counts once
+
+            Returns
+            -------
+            pyarrow.Table
+                the group columns ('period' first) and their 'count', sorted by group
+        '''
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        if period is not None and period not in periods:
+            raise ValueError(f'period should be one of {periods}, not {period}')
+        date_column = 'date_'+kind
+        keys = list(by or [])
+        table = self.filter_since(self.table(kind, list(dict.fromkeys(keys + [date_column, 'apply_url_key']))), date_column, since)
+        if period:
+            table = table.append_column('period', pc.floor_temporal(table[date_column], unit=period, week_starts_monday=True))
+            keys = ['period'] + keys
+        aggregation = ('apply_url_key', 'count_distinct') if distinct else ([], 'count_all')
+        if not keys:
+            count = pc.count_distinct(table['apply_url_key']).as_py() if distinct else table.num_rows
+            return pa.table({'count': pa.array([count], type=pa.int64())})
+        counts = table.group_by(keys).aggregate([aggregation])
+        counts = counts.rename_columns([c if c in keys else 'count' for c in counts.column_names])
+        return counts.select(keys + ['count']).sort_by([(k, 'ascending') for k in keys])
+
+    def funnel(self, since=None):
+        '''
+        count the distinct jobs (by apply url) that were scraped, then of those the ones seen, then of those the ones applied to
+
+            Parameters
+            ----------
+            since : datetime.datetime, default None
+                if given, only follow the jobs scraped from then on
+
+            Returns
+            -------
+            dict
+                number of jobs at each stage: 'scraped', 'seen', 'applied'
+        '''
+        import pyarrow.compute as pc
+        scraped = self.filter_since(self.table('scraped', ['apply_url_key', 'date_scraped']), 'date_scraped', since)
+        jobs = pc.unique(scraped['apply_url_key'].drop_null())
+        funnel = {'scraped': len(jobs)}
+        for kind in ['seen', 'applied']:
+            jobs = jobs.filter(pc.is_in(jobs, value_set=pc.unique(self.table(kind, ['apply_url_key'])['apply_url_key'])))
+            funnel[kind] = len(jobs)
+        return funnel
@@ -0,0 +1,196 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# page titles of anti-bot challenges and block pages (cloudflare, indeed, perimeterx, datadome, generic), lowercase
+challenge_titles = ['just a moment', 'attention required', 'security check', 'access denied', 'access to this page has been denied',
+                    'verify you are human', 'are you a robot', 'request blocked', 'too many requests', 'captcha']
+# markers of the same pages in html, only looked for in pages lacking the element they were expected to have,
+# as normal pages embedding a turnstile or hcaptcha widget (e.g. apply forms) have some of them too
+challenge_markers = ['challenges.cloudflare.com', 'cf-chl-', 'cf-error-details', 'px-captcha', 'captcha-delivery.com', 'hcaptcha.com/captcha']
+
+
+class Blocked(Exception):
+    '''a page kept being a challenge or block page after every retry'''
+
+
+class NavigationScheduler():
+    '''
+    Paces every page load of every driver session, per host, and retries the loads that hit a challenge or block page.
+    Each host has a token bucket whose rate grows by growth with every successful load up to max_rate, until the host's first challenge.
+    A challenge brings the rate down to decrease times the rate it happened at (not below min_rate), and the host cools down
+    with an exponential backoff. From then on, the rate grows by growth while below decrease times the rate of the last challenge,
+    then only creeps up by increase per load. The rate of each host thus quickly reaches, then settles just under, what the site tolerates
+    '''
+
+    def __init__(self, start_rate=1., min_rate=.05, max_rate=10., growth=.2, decrease=.8, increase=.002, burst=1., backoff=5., max_backoff=300., retries=2) -> None:
+        '''
+        Parameters
+        ----------
+        start_rate : float, default 1.
+            page loads per second allowed to a host not loaded from yet
+        min_rate : float, default .05
+            lowest rate challenges can bring a host down to
+        max_rate : float, default 10.
+            highest rate successful loads can bring a host up to
+        growth : float, default .2
+            fraction of its rate added to a host after each successful load, before its first challenge
+            and while below decrease times the rate it was last challenged at
+        decrease : float, default .8
+            fraction of its rate a host keeps after a challenge
+        increase : float, default .002
+            fraction of the rate it was last challenged at added to a host after each successful load, once past decrease times that rate
+        burst : float, default 1.
+            page loads a host can get at once after being idle
+        backoff : float, default 5.
+            seconds a host cools down after its first challenge, doubled with each challenge in a row
+        max_backoff : float, default 300.
+            longest cool down in seconds
+        retries : int, default 2
+            times a load is retried after a challenge before Blocked is raised
+        '''
+        self.start_rate = start_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.growth = growth
+        self.decrease = decrease
+        self.increase = increase
+        self.burst = burst
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = retries
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def host(self, url: str):
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = {'rate': self.start_rate, 'tokens': self.burst, 'updated': time.monotonic(), 'resume_at': 0., 'strikes': 0, 'challenged_at': None,
+                                'loads': 0, 'challenges': 0}
+        return self.hosts[host]
+
+    def acquire(self, url: str, min_interval: float=None, sleep=time.sleep):
+        '''
+        block until a page load from url's host is allowed
+
+            Parameters
+            ----------
+            url : str
+                url about to be loaded
+            min_interval : float, default None
+                if given, the host's rate is capped at one load per min_interval seconds for this load
+            sleep : callable, default time.sleep
+                called with the seconds to wait, e.g. Metrics.sleep so waits are counted as sleep time
+
+            Returns
+            -------
+            int
+                number of challenges the host had when the load was allowed, to pass on to report()
+        '''
+        while True:
+            with self.lock: # take the host's next token, then sleep outside the lock so other hosts are not held up
+                h = self.host(url)
+                now = time.monotonic()
+                rate = min(h['rate'], 1/min_interval) if min_interval else h['rate']
+                h['tokens'] = min(self.burst, h['tokens'] + max(0, now - h['updated']) * rate) - 1
+                h['updated'] = max(now, h['updated'])
+                wait = max(-h['tokens'] / rate, h['resume_at'] - now, 0)
+                challenges = h['challenges']
+            if wait:
+                sleep(wait)
+            with self.lock:
+                if h['challenges'] == challenges: # otherwise the host was challenged while waiting, wait for a token at its new rate
+                    return challenges
+
+    def report(self, url: str, blocked: bool, challenges: int=None):
+        '''
+        adapt the rate of url's host to the outcome of a load
+
+            Parameters
+            ----------
+            url : str
+                url that was loaded
+            blocked : bool
+                True if the load hit a challenge or block page
+            challenges : int, default None
+                output of acquire() for the load, a challenge to a load allowed before the host's last challenge
+                was caused by the rate that challenge already brought down, so it is only counted
+        '''
+        with self.lock:
+            h = self.host(url)
+            h['loads'] += 1
+            if not blocked:
+                if h['challenged_at'] is None or h['rate'] < h['challenged_at'] * self.decrease:
+                    h['rate'] = min(self.max_rate, h['rate'] * (1 + self.growth))
+                else: # close to what the site tolerates
+                    h['rate'] = min(self.max_rate, h['rate'] + h['challenged_at'] * self.increase)
+                h['strikes'] = 0
+                return
+            h['challenges'] += 1
+            if challenges is not None and challenges < h['challenges'] - 1:
+                return
+            h['challenged_at'] = h['rate']
+            h['rate'] = max(self.min_rate, h['rate'] * self.decrease)
+            h['strikes'] += 1
+            cool_down = min(self.max_backoff, self.backoff * 2**(h['strikes']-1)) * random.uniform(1, 1.5)
+            h['resume_at'] = time.monotonic() + cool_down
+            h['tokens'], h['updated'] = 0., h['resume_at'] # tokens pile up again from the end of the cool down only
+
+    def is_blocked(self, driver, page_source: str=None, expect: str=None):
+        '''
+        return True if the driver's page is a challenge or block page: by its title, or if page_source is given
+        and lacks the element of id expect, by the challenge markers in its html
+        '''
+        title = (getattr(driver, 'title', '') or '').lower()
+        if any(t in title for t in challenge_titles):
+            return True
+        if page_source is None or not expect or f'id="{expect}"' in page_source or f"id='{expect}'" in page_source:
+            return False
+        return any(m in page_source for m in challenge_markers)
+
+    def navigate(self, driver, url: str, expect: str=None, source=False, min_interval: float=None, sleep=time.sleep):
+        '''
+        load url in driver when its host allows it, retrying after a cool down while the page is a challenge or block page
+
+            Parameters
+            ----------
+            driver : selenium.webdriver.Remote
+                driver to load the page in
+            url : str
+                url to load
+            expect : str, default None
+                id of an element the page should have, e.g. 'jobDescriptionText', a page without it is a block page if it has challenge markers. Implies source
+            source : bool, default False
+                if True, return the page's html
+            min_interval : float, default None
+                if given, minimum time in seconds between page loads from url's host, see acquire()
+            sleep : callable, default time.sleep
+                called with the seconds to wait for the host, see acquire()
+
+            Returns
+            -------
+            str or None
+                the page's html if source or expect, None otherwise
+
+            Raises
+            ------
+            Blocked
+                if the page was still a challenge or block page after self.retries retries
+        '''
+        source = source or expect is not None
+        for attempt in range(self.retries+1):
+            challenges = self.acquire(url, min_interval, sleep)
+            driver.get(url)
+            page_source = driver.page_source if source else None
+            blocked = self.is_blocked(driver, page_source, expect)
+            self.report(url, blocked, challenges)
+            if not blocked:
+                return page_source
+        raise Blocked(f'{url} still blocked after {self.retries} retries')
+
+    def stats(self):
+        '''return the current rate, number of loads and of challenges of every host'''
+        with self.lock:
+            return {host: {k: h[k] for k in ['rate', 'loads', 'challenges']} for host, h in self.hosts.items()}
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+from utils import text_key, url_key
+
+
+mersenne_prime = np.uint64(4294967291) # largest prime below 2**32
+
+
+def shingle_hashes(text: str, k=3):
+    '''
+    return the distinct 32 bit hashes of every k consecutive words of a text, lowercased and stripped of punctuation
+
+        Parameters
+        ----------
+        text : str
+            text to shingle
+        k : int, default 3
+            number of words per shingle
+
+        Returns
+        -------
+        numpy.ndarray
+            uint64 array of shingle hashes
+    '''
+    words = re.findall(r'\w+', text.lower())
+    word_hashes = np.fromiter((zlib.crc32(w.encode('utf-8')) for w in words), dtype=np.uint64, count=len(words))
+    k = min(k, len(words))
+    if not k:
+        return word_hashes
+    shingles = word_hashes[:len(words)-k+1].copy()
+    for j in range(1, k): # combine the words of each shingle, stays below 2**52 so never overflows
+        shingles = (shingles * np.uint64(1000003) + word_hashes[j:len(words)-k+1+j]) & np.uint64(0xFFFFFFFF)
+    return np.unique(shingles)
+
+
+def lsh_params(threshold: float, num_perm: int):
+    '''
+    return the (bands, rows) split of minhash signatures minimising the sum of false positive and false negative probabilities at threshold
+    '''
+    s, ds = np.linspace(0, 1, 1001, retstep=True)
+    best, best_err = None, np.inf
+    for bands in range(1, num_perm+1):
+        rows = num_perm // bands
+        candidate = 1 - (1 - s**rows)**bands # probability two sets of jaccard s share a bucket
+        fp = np.where(s < threshold, candidate, 0).sum() * ds
+        fn = np.where(s >= threshold, 1 - candidate, 0).sum() * ds
+        if fp + fn < best_err:
+            best, best_err = (bands, rows), fp + fn
+    return best
+
+
+class MinHasher():
+    '''minhash signatures of texts' word shingles, reproducible across runs for a given seed'''
+
+    def __init__(self, num_perm=128, seed=1, shingle_size=3) -> None:
+        rng = np.random.default_rng(seed)
+        # kept below 2**31 so a * hash + b never overflows uint64
+        self.a = rng.integers(1, 2**31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2**31, num_perm, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def signature(self, text: str):
+        '''return the uint32 minhash signature of a text'''
+        shingles = shingle_hashes(text, self.shingle_size)
+        if not len(shingles):
+            return np.full(len(self.a), 0xFFFFFFFF, dtype=np.uint32)
+        return ((self.a[:, None] * shingles[None, :] + self.b[:, None]) % mersenne_prime).min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex():
+    '''
+    Locality sensitive hashing index of the minhash signatures of every scraped job description.
+    Signatures are stored next to the scraped jobs with the description and apply url fingerprints of their job,
+    and jobs scraped since are indexed the next time the index is used
+    '''
+
+    def __init__(self, storage, index_path: str, threshold=.8, num_perm=128, kind='scraped') -> None:
+        '''
+        Parameters
+        ----------
+        storage : JsonlStorage or SqliteStorage
+            job history the index mirrors
+        index_path : str
+            path prefix of the index, '.bin' and '.json' are appended to it for the records and the metadata
+        threshold : float, default .8
+            estimated jaccard similarity of the descriptions' word shingles above which two jobs are near-duplicates
+        num_perm : int, default 128
+            size of the minhash signatures
+        kind : str, default 'scraped'
+            kind of storage records to index
+        '''
+        self.storage = storage
+        self.kind = kind
+        self.records_path = index_path+'.bin'
+        self.meta_path = index_path+'.json'
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.hasher = MinHasher(num_perm)
+        self.record_dtype = np.dtype([('sig', '<u4', (num_perm,)), ('desc', '<u8'), ('url', '<u8')])
+        self.records = None # loaded on first use
+
+    def load(self):
+        '''load the index if not loaded yet, and index any stored scraped jobs it does not cover'''
+        if self.records is None:
+            cursor, fingerprint = 0, None
+            if os.path.exists(self.meta_path) and os.path.exists(self.records_path):
+                with open(self.meta_path) as f:
+                    meta = json.load(f)
+                if meta.get('num_perm') == self.num_perm and meta.get('source') == self.storage.source(self.kind):
+                    cursor, fingerprint = meta['cursor'], meta.get('fingerprint')
+            if not self.storage.cursor_valid(self.kind, cursor, fingerprint): # scraped jobs were rewritten, index them from scratch
+                cursor = 0
+            if cursor:
+                self.records = np.fromfile(self.records_path, dtype=self.record_dtype)
+            else:
+                self.records = np.empty(0, dtype=self.record_dtype)
+                open(self.records_path, 'wb').close()
+            self.cursor = cursor
+            self.build_buckets()
+        elif self.bucket_threshold != self.threshold:
+            self.build_buckets()
+        self.sync()
+
+    def build_buckets(self):
+        self.bucket_threshold = self.threshold
+        self.bands, self.rows = lsh_params(self.threshold, self.num_perm)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.add_to_buckets(self.records['sig'], 0)
+
+    def add_to_buckets(self, sigs: np.ndarray, start: int):
+        for band, bucket in enumerate(self.buckets):
+            band_sigs = np.ascontiguousarray(sigs[:, band*self.rows:(band+1)*self.rows])
+            for i, key in enumerate(band_sigs.view(f'V{band_sigs.shape[1]*4}').ravel().tolist()):
+                bucket.setdefault(key, []).append(start+i)
+
+    def sync(self):
+        '''index the scraped jobs stored since the index was last synced'''
+        new, cursor = [], self.cursor
+        for job, cursor in self.storage.iter_records(self.kind, self.cursor):
+            description = job.get('description') or ''
+            new.append((self.hasher.signature(description), text_key(description) if description else 0, url_key(job['apply_url']) if job.get('apply_url') else 0))
+        if cursor == self.cursor:
+            return
+        self.cursor = cursor
+        records = np.array(new, dtype=self.record_dtype)
+        with open(self.records_path, 'ab') as f:
+            f.write(records.tobytes())
+        with open(self.meta_path+'.tmp', 'w') as f:
+            json.dump({'cursor': self.cursor, 'fingerprint': self.storage.fingerprint(self.kind, self.cursor), 'source': self.storage.source(self.kind), 'num_perm': self.num_perm}, f)
+        os.replace(self.meta_path+'.tmp', self.meta_path)
+        self.add_to_buckets(records['sig'], len(self.records))
+        self.records = np.concatenate([self.records, records])
+
+    def query(self, description: str, signature: np.ndarray=None):
+        '''
+        return the indexed jobs whose description is a near-duplicate of description
+
+            Parameters
+            ----------
+            description : str
+                job description to look up
+            signature : numpy.ndarray, default None
+                minhash signature of the description, computed if None
+
+            Returns
+            -------
+            numpy.ndarray
+                records (with fields sig, desc and url: description and apply url fingerprints) of the near-duplicates,
+                including the job itself if it was indexed
+        '''
+        if self.records is None or self.bucket_threshold != self.threshold:
+            self.load()
+        if signature is None:
+            signature = self.hasher.signature(description)
+        candidates = set()
+        for band, bucket in enumerate(self.buckets):
+            candidates.update(bucket.get(signature[band*self.rows:(band+1)*self.rows].tobytes(), []))
+        if not candidates:
+            return self.records[:0]
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarities = (self.records['sig'][candidates] == signature).mean(axis=1)
+        return self.records[candidates[similarities >= self.threshold]]
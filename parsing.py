@@ -0,0 +1,79 @@
+import importlib.util
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+
+# lxml parses several times faster than the pure python html.parser, used when installed
+default_html_parser = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+form_control_names = ['input', 'select', 'textarea', 'datalist', 'optgroup'] # removed 'button'
+# only the parts of indeed pages that AutoApply extracts from
+search_page_strainer = SoupStrainer('a') # job title links and the next page link
+description_page_strainer = SoupStrainer(id=['jobDescriptionText', 'applyButtonLinkContainer'])
+# page parts that are never part of a job description: code, navigation, site header and footer, sidebars
+boilerplate_tags = ['script', 'style', 'noscript', 'template', 'svg', 'iframe', 'nav', 'footer', 'aside']
+boilerplate_roles = ['navigation', 'banner', 'contentinfo', 'complementary']
+# returns the html of the smallest subtree holding every form control and enough text around them for get_surrounding_text(),
+# None if the page has no form control
+form_root_js = '''
+const controls = document.querySelectorAll(arguments[1].join(', '));
+if (!controls.length) return null;
+let root = controls[0];
+for (const el of controls) {
+    while (!root.contains(el)) root = root.parentElement;
+}
+function textLength(el) { // same text as get_text_index(): without options, scripts and styles
+    let n = el.textContent.length;
+    for (const sub of el.querySelectorAll('option, script, style, template')) n -= sub.textContent.length;
+    return n;
+}
+// surrounding text climbs while the parent's text is short enough, so the subtree must end with a longer one
+while (root.parentElement && textLength(root) <= arguments[0]) root = root.parentElement;
+return root.outerHTML;
+'''
+
+
+def parse_html(html: str, parser: str=None, parse_only: SoupStrainer=None):
+    '''
+    return BeautifulSoup of html
+
+        Parameters
+        ----------
+        html : str
+            html to parse
+        parser : str, default None
+            BeautifulSoup tree builder, 'lxml' or 'html.parser'. If None, default_html_parser
+        parse_only : SoupStrainer, default None
+            if given, only the matching elements (and their descendants) are built into the tree
+
+        Returns
+        -------
+        BeautifulSoup
+    '''
+    return BeautifulSoup(html, parser or default_html_parser, parse_only=parse_only)
+
+
+def normalize_whitespace(text: str):
+    '''return text with runs of spaces and tabs collapsed, lines stripped and blank lines removed'''
+    return '\n'.join(line for line in (re.sub(r'[^\S\n]+', ' ', line).strip() for line in text.splitlines()) if line)
+
+
+def page_text(page: BeautifulSoup):
+    '''
+    return the text of a page without its boilerplate: the text of its main content (main or article element) if it has one,
+    without boilerplate_tags and elements of boilerplate_roles, whitespace normalized. page is modified
+
+        Parameters
+        ----------
+        page : BeautifulSoup
+            page to extract the text of
+
+        Returns
+        -------
+        str
+    '''
+    root = page.find('main') or page.find(attrs={'role': 'main'}) or page.find('article') or page
+    for el in root.find_all(boilerplate_tags) + root.find_all(attrs={'role': boilerplate_roles}):
+        if not el.decomposed:
+            el.decompose()
+    return normalize_whitespace(root.get_text())
@@ -0,0 +1,113 @@
+import cProfile
+import datetime
+import json
+import threading
+from contextlib import contextmanager, nullcontext
+from time import perf_counter, sleep
+
+
+no_stage = nullcontext() # returned by Metrics.stage() outside of a recorded run, so disabled metrics cost next to nothing
+
+
+class Metrics():
+    '''
+    Per-run timings and counters of the autofill and scrape pipelines.
+    Each run (e.g. one autofill_current_page() call) is appended as one json line to the metrics file, with:
+    - stages: total seconds and number of calls of each named stage
+    - counts: counters such as form elements or webdriver calls
+    - values: lists of recorded values such as encode batch sizes
+    - sleep_seconds and work_seconds: time spent in deliberate delays, and the rest of the run
+    Runs started inside another run are part of it. Disabled when path is None, every method is then a no-op
+    '''
+
+    def __init__(self, path: str=None, profile=False) -> None:
+        '''
+        Parameters
+        ----------
+        path : str, default None
+            jsonl file the run reports are appended to, None to disable metrics
+        profile : bool, default False
+            if True, also run each run under cProfile and save its stats next to the metrics file (path.<run>.<time>.prof),
+            to open with snakeviz or turn into a flamegraph with flameprof
+        '''
+        self.path = path
+        self.profile = profile
+        self.lock = threading.Lock() # scrape sessions record from several threads
+        self.report = None # report of the run being recorded
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    @contextmanager
+    def run(self, name: str, **info):
+        '''record everything that happens inside the with block as one run, info is added to the report as is'''
+        if not self.enabled or self.report is not None:
+            yield
+            return
+        started = datetime.datetime.now()
+        self.report = {'run': name, 'started': started.isoformat(), **info, 'stages': {}, 'counts': {}, 'values': {}, 'sleep_seconds': 0.}
+        profiler = cProfile.Profile() if self.profile else None
+        t = perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            report, self.report = self.report, None
+            report['seconds'] = perf_counter() - t
+            report['work_seconds'] = report['seconds'] - report['sleep_seconds']
+            if profiler:
+                report['profile'] = self.path+'.'+name+'.'+started.strftime('%Y%m%dT%H%M%S%f')+'.prof'
+                profiler.dump_stats(report['profile'])
+            with self.lock, open(self.path, 'a') as f:
+                f.write(json.dumps(report)+'\n')
+
+    def stage(self, name: str):
+        '''return a context manager adding the time spent in its with block to stage name'''
+        if self.report is None:
+            return no_stage
+        return self.timed(name)
+
+    @contextmanager
+    def timed(self, name: str):
+        t = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - t)
+
+    def add_time(self, name: str, seconds: float):
+        with self.lock:
+            if self.report is None:
+                return
+            stage = self.report['stages'].setdefault(name, {'seconds': 0., 'calls': 0})
+            stage['seconds'] += seconds
+            stage['calls'] += 1
+
+    def count(self, name: str, n=1):
+        '''add n to counter name'''
+        if self.report is None:
+            return
+        with self.lock:
+            if self.report is not None:
+                self.report['counts'][name] = self.report['counts'].get(name, 0) + n
+
+    def record(self, name: str, value):
+        '''append value to the values recorded under name'''
+        if self.report is None:
+            return
+        with self.lock:
+            if self.report is not None:
+                self.report['values'].setdefault(name, []).append(value)
+
+    def sleep(self, seconds: float):
+        '''time.sleep(), counted as sleep time rather than work time'''
+        sleep(seconds)
+        if self.report is None:
+            return
+        with self.lock:
+            if self.report is not None:
+                self.report['sleep_seconds'] += seconds
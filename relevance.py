@@ -0,0 +1,148 @@
+import json
+import os
+
+import numpy as np
+
+from answer_index import normalize
+from utils import text_key
+
+
+class RelevanceIndex():
+    '''
+    Normalized sbert embeddings of every distinct scraped job description, kept in a memory-mapped file next to the scraped jobs
+    along with the fingerprint of their description. Jobs scraped since the index was last synced are embedded the next time it is used,
+    each description only once, so ranking jobs (or the whole history) by similarity to a few queries is a single matrix product
+    '''
+
+    def __init__(self, storage, index_path: str, model_name: str, kind='scraped', batch_size=256) -> None:
+        '''
+        Parameters
+        ----------
+        storage : JsonlStorage or SqliteStorage
+            job history the index mirrors
+        index_path : str
+            path prefix of the index, '.bin' and '.json' are appended to it for the records and the metadata
+        model_name : str
+            name of the model producing the embeddings, the index is rebuilt when it changes
+        kind : str, default 'scraped'
+            kind of storage records to index
+        batch_size : int, default 256
+            descriptions embedded per model call, the index is saved after each
+        '''
+        self.storage = storage
+        self.kind = kind
+        self.records_path = index_path+'.bin'
+        self.meta_path = index_path+'.json'
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.records = None # loaded on first use
+        self.rows = {} # description fingerprint: row of its embedding
+
+    def record_dtype(self, dim: int):
+        return np.dtype([('desc', '<u8'), ('emb', '<f4', (dim,))])
+
+    def load(self, encoder):
+        '''load the index if not loaded yet, and embed the descriptions of any stored jobs it does not cover with encoder'''
+        if self.records is None:
+            meta = {}
+            if os.path.exists(self.meta_path) and os.path.exists(self.records_path):
+                with open(self.meta_path) as f:
+                    meta = json.load(f)
+            if meta.get('model') != self.model_name or meta.get('source') != self.storage.source(self.kind) or not self.storage.cursor_valid(self.kind, meta['cursor'], meta.get('fingerprint')):
+                meta = {} # start over
+                open(self.records_path, 'wb').close()
+            self.cursor, self.dim = meta.get('cursor', 0), meta.get('dim')
+            if self.dim: # drop a record cut short by an interrupted write, appending after it would misalign every following one
+                itemsize = self.record_dtype(self.dim).itemsize
+                os.truncate(self.records_path, os.path.getsize(self.records_path) // itemsize * itemsize)
+            self.map_records()
+        self.sync(encoder)
+
+    def map_records(self):
+        if self.dim is None or not os.path.getsize(self.records_path):
+            self.records = np.empty(0, dtype=self.record_dtype(self.dim or 0))
+        else:
+            self.records = np.memmap(self.records_path, dtype=self.record_dtype(self.dim), mode='r')
+        self.rows = {fp: i for i, fp in enumerate(self.records['desc'].tolist())}
+
+    def save_meta(self):
+        with open(self.meta_path+'.tmp', 'w') as f:
+            json.dump({'cursor': self.cursor, 'fingerprint': self.storage.fingerprint(self.kind, self.cursor), 'source': self.storage.source(self.kind), 'model': self.model_name, 'dim': self.dim}, f)
+        os.replace(self.meta_path+'.tmp', self.meta_path)
+
+    def add(self, descriptions: dict, encoder):
+        '''embed and append {fingerprint: description} not indexed yet, batch by batch'''
+        descriptions = {fp: d for fp, d in descriptions.items() if fp not in self.rows}
+        items = list(descriptions.items())
+        base = len(self.rows) # row of the first appended description
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start+self.batch_size]
+            embs = normalize(encoder([d for _, d in batch]))
+            self.dim = embs.shape[1]
+            records = np.empty(len(batch), dtype=self.record_dtype(self.dim))
+            records['desc'] = [fp for fp, _ in batch]
+            records['emb'] = embs
+            with open(self.records_path, 'ab') as f:
+                f.write(records.tobytes())
+            self.rows.update((fp, base+start+i) for i, (fp, _) in enumerate(batch))
+        if items:
+            self.map_records()
+
+    def sync(self, encoder):
+        '''embed the descriptions of the jobs stored since the index was last synced, saving the index after each batch'''
+        new, cursor = {}, self.cursor
+        for job, cursor in self.storage.iter_records(self.kind, self.cursor):
+            if job.get('description'):
+                fp = text_key(job['description'])
+                if fp not in self.rows:
+                    new[fp] = job['description']
+            if len(new) >= self.batch_size:
+                self.add(new, encoder)
+                self.cursor, new = cursor, {}
+                self.save_meta()
+        if cursor == self.cursor:
+            return
+        self.add(new, encoder)
+        self.cursor = cursor
+        self.save_meta()
+
+    def similarities(self, query_embs: np.ndarray):
+        '''
+        return the similarity of every indexed description to the closest of the queries
+
+            Parameters
+            ----------
+            query_embs : numpy.ndarray
+                one embedding row per query
+
+            Returns
+            -------
+            numpy.ndarray
+                highest cosine similarity to a query of each row of the index
+        '''
+        if not len(self.records):
+            return np.empty(0, dtype=np.float32)
+        return (self.records['emb'] @ normalize(query_embs).T).max(axis=1)
+
+    def scores(self, jobs: list[dict], query_embs: np.ndarray, encoder):
+        '''
+        return the similarity of each job's description to the closest of the queries, descriptions not indexed yet are embedded first
+
+            Parameters
+            ----------
+            jobs : list[dict]
+                jobs to score, should have the structure of the output of AutoApply.get_jobs()
+            query_embs : numpy.ndarray
+                one embedding row per query
+            encoder : callable
+                takes a list of str and returns a 2d array of embeddings
+
+            Returns
+            -------
+            numpy.ndarray
+                similarity of each job, nan for jobs without description
+        '''
+        fps = [text_key(job['description']) if job.get('description') else None for job in jobs]
+        self.add({fp: job['description'] for fp, job in zip(fps, jobs) if fp is not None}, encoder)
+        similarities = self.similarities(query_embs)
+        return np.array([similarities[self.rows[fp]] if fp is not None else np.nan for fp in fps], dtype=np.float32)
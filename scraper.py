@@ -0,0 +1,140 @@
+import datetime
+import queue
+import threading
+import time
+from urllib.parse import urljoin
+
+from selenium import webdriver
+
+from navigation import NavigationScheduler, Blocked
+from parsing import parse_html, default_html_parser, search_page_strainer, description_page_strainer
+
+
+def headless_chrome():
+    '''return a new headless chrome session, the default driver factory of ScrapePool'''
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    return webdriver.Chrome(options=options)
+
+
+class ScrapePool():
+    '''
+    Scrapes indeed searches with several driver sessions at once.
+    Search pages produce description page tasks, which are consumed by a bounded pool of worker sessions
+    that extract the job and resolve its apply redirect, keeping no page after its job is extracted.
+    Pages still blocked after the navigator's retries are put back at the end of the queue, up to max_requeues times
+    '''
+
+    def __init__(self, auto_app, driver_factory=headless_chrome, n_sessions=4, host_delay=None, html_parser=default_html_parser, navigator=None, max_requeues=2, sleep=time.sleep) -> None:
+        '''
+        Parameters
+        ----------
+        auto_app : AutoApply
+            provides the page parsing methods (get_description_urls, get_description, get_indeed_apply_url)
+        driver_factory : callable, default headless_chrome
+            returns a new selenium driver, called once per session.
+            Separate sessions are used rather than tabs, as the tabs of one session can only be driven one at a time
+        n_sessions : int, default 4
+            number of driver sessions loading pages concurrently
+        host_delay : float, default None
+            if given, minimum time in seconds between two page loads from the same host, across all sessions
+        html_parser : str, default parsing.default_html_parser
+            BeautifulSoup tree builder pages are parsed with
+        navigator : NavigationScheduler, default None
+            paces and retries the page loads of every session, a new one if None
+        max_requeues : int, default 2
+            times a blocked page is put back in the queue before it is given up
+        sleep : callable, default time.sleep
+            called with the seconds a session waits for the navigator, e.g. Metrics.sleep
+        '''
+        self.auto_app = auto_app
+        self.driver_factory = driver_factory
+        self.n_sessions = n_sessions
+        self.host_delay = host_delay
+        self.html_parser = html_parser
+        self.navigator = navigator or NavigationScheduler()
+        self.max_requeues = max_requeues
+        self.sleep = sleep
+
+    def get_page(self, driver, url: str, parse_only=None, expect: str=None):
+        return parse_html(self.navigator.navigate(driver, url, expect, source=True, min_interval=self.host_delay, sleep=self.sleep), self.html_parser, parse_only)
+
+    def scrape_search(self, driver, search_url: str, tasks: queue.Queue):
+        for url in self.auto_app.get_description_urls(self.get_page(driver, search_url, search_page_strainer), search_url):
+            tasks.put(('description', url, search_url, 0))
+
+    def scrape_description(self, driver, url: str, search_url: str):
+        page = self.get_page(driver, url, description_page_strainer, 'jobDescriptionText')
+        description = self.auto_app.get_description(page)
+        indeed_joblink_redirect = self.auto_app.get_indeed_apply_url(page)
+        del page # only the extracted fields are kept
+        if not indeed_joblink_redirect: # if the link was not found, just use the indeed description page url
+            indeed_joblink_redirect = url
+        indeed_joblink_redirect = urljoin(url, indeed_joblink_redirect)
+        self.navigator.navigate(driver, indeed_joblink_redirect, min_interval=self.host_delay, sleep=self.sleep)
+        return {'search_url': search_url, 'description_url': url, 'apply_url': driver.current_url, 'description': description, 'date_scraped': datetime.datetime.now()}
+
+    def work(self, driver, tasks: queue.Queue, results: queue.Queue, stop: threading.Event):
+        while True:
+            task = tasks.get()
+            if task is None:
+                tasks.task_done()
+                return
+            if stop.is_set(): # consumer is gone, drain without scraping
+                tasks.task_done()
+                continue
+            kind, url, search_url, attempts = task
+            try:
+                if kind == 'search':
+                    self.scrape_search(driver, url, tasks)
+                else:
+                    results.put(self.scrape_description(driver, url, search_url))
+            except Blocked as e:
+                if attempts < self.max_requeues: # behind the other tasks, queued before this one is done so the run doesn't end
+                    tasks.put((kind, url, search_url, attempts+1))
+                else:
+                    print('Warning: could not scrape', url, 'resulted in:')
+                    print(e)
+            except Exception as e:
+                print('Warning: could not scrape', url, 'resulted in:')
+                print(e)
+            finally:
+                tasks.task_done()
+
+    def run(self, search_urls: list[str]):
+        '''
+        scrape the first page of results of every search, yielding jobs as soon as each one is extracted
+
+            Parameters
+            ----------
+            search_urls : list[str]
+                list of indeed search urls
+
+            Yields
+            ------
+            dict
+                job with the same structure as the output of AutoApply.get_jobs(), in order of completion
+        '''
+        tasks, results, stop = queue.Queue(), queue.Queue(), threading.Event()
+        for search_url in search_urls:
+            tasks.put(('search', search_url, search_url, 0))
+        drivers, workers = [], []
+        try:
+            for _ in range(self.n_sessions): # the drivers started before one fails to are quit below
+                drivers.append(self.driver_factory())
+            workers = [threading.Thread(target=self.work, args=(driver, tasks, results, stop), daemon=True) for driver in drivers]
+            for w in workers:
+                w.start()
+            # once every task (including those added by search pages) is done, tell the consumer
+            done = threading.Thread(target=lambda: (tasks.join(), results.put(None)), daemon=True)
+            done.start()
+            while (job := results.get()) is not None:
+                yield job
+        finally:
+            stop.set() # if the consumer stopped early, the remaining tasks are dropped
+            for _ in workers:
+                tasks.put(None)
+            for w in workers:
+                w.join()
+            for driver in drivers:
+                driver.quit()
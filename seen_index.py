@@ -0,0 +1,130 @@
+import datetime
+import json
+import os
+
+import numpy as np
+
+from utils import text_key, url_key
+
+
+record_dtype = np.dtype([('fp', '<u8'), ('ts', '<f8')])
+
+
+def job_fingerprints(job: dict):
+    '''return the fingerprints identifying a job: its description and its apply url'''
+    fps = []
+    if job.get('description'):
+        fps.append(text_key(job['description']))
+    if job.get('apply_url'):
+        fps.append(url_key(job['apply_url']))
+    return fps
+
+
+def parse_seen_date(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    try: # days in jsonl files, full precision in sqlite
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SeenIndex():
+    '''
+    On-disk index of when jobs were last seen, keyed by job fingerprints.
+    Records are appended to a binary file as jobs are viewed, and seen jobs
+    stored by anything else are indexed the next time the index is loaded
+    '''
+
+    def __init__(self, storage, index_path: str, kind='seen') -> None:
+        '''
+        Parameters
+        ----------
+        storage : JsonlStorage or SqliteStorage
+            job history the index mirrors
+        index_path : str
+            path prefix of the index, '.bin' and '.json' are appended to it for the records and the metadata
+        kind : str, default 'seen'
+            kind of storage records to index
+        '''
+        self.storage = storage
+        self.kind = kind
+        self.records_path = index_path+'.bin'
+        self.meta_path = index_path+'.json'
+        self.last_seen = None # fingerprint -> timestamp, loaded on first use
+
+    def load(self):
+        '''load the index if not loaded yet, and index any stored seen jobs it does not cover'''
+        if self.last_seen is not None:
+            self.index_stored()
+            return
+        cursor, fingerprint = 0, None
+        if os.path.exists(self.meta_path) and os.path.exists(self.records_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta.get('source') == self.storage.source(self.kind):
+                cursor, fingerprint = meta['cursor'], meta.get('fingerprint')
+        if not self.storage.cursor_valid(self.kind, cursor, fingerprint): # seen jobs were rewritten, index them from scratch
+            cursor = 0
+        self.last_seen = {}
+        if cursor:
+            records = np.fromfile(self.records_path, dtype=record_dtype)
+            for fp, ts in zip(records['fp'].tolist(), records['ts'].tolist()):
+                if ts > self.last_seen.get(fp, -np.inf):
+                    self.last_seen[fp] = ts
+        else:
+            open(self.records_path, 'wb').close()
+        self.cursor = cursor
+        self.index_stored()
+
+    def index_stored(self):
+        '''index the seen jobs stored since the index's cursor'''
+        fps, tss, cursor = [], [], self.cursor
+        for job, cursor in self.storage.iter_records(self.kind, self.cursor):
+            seen = parse_seen_date(job.get('date_'+self.kind))
+            if seen is None:
+                continue
+            for fp in job_fingerprints(job):
+                fps.append(fp)
+                tss.append(seen.timestamp())
+        if cursor != self.cursor:
+            self.cursor = cursor
+            self.append(fps, tss)
+
+    def append(self, fps: list[int], tss: list[float]):
+        records = np.empty(len(fps), dtype=record_dtype)
+        records['fp'], records['ts'] = fps, tss
+        with open(self.records_path, 'ab') as f:
+            f.write(records.tobytes())
+        for fp, ts in zip(fps, tss):
+            if ts > self.last_seen.get(fp, -np.inf):
+                self.last_seen[fp] = ts
+        with open(self.meta_path+'.tmp', 'w') as f:
+            json.dump({'cursor': self.cursor, 'fingerprint': self.storage.fingerprint(self.kind, self.cursor), 'source': self.storage.source(self.kind)}, f)
+        os.replace(self.meta_path+'.tmp', self.meta_path)
+
+    def sync(self):
+        '''
+        catch up on the seen jobs appended to the storage since the index's cursor, e.g. after viewing a job.
+        Jobs are indexed from their storage records, with the storage's date precision (days for jsonl files)
+        '''
+        self.load()
+
+    def get_last_seen(self, fps: list[int]):
+        '''
+        return when any job with one of the given fingerprints was last seen
+
+            Parameters
+            ----------
+            fps : list[int]
+                fingerprints to look up, e.g. job_fingerprints() of a job
+
+            Returns
+            -------
+            datetime.datetime
+                last time seen, None if never seen
+        '''
+        if self.last_seen is None:
+            self.load()
+        ts = max((self.last_seen.get(fp, -np.inf) for fp in fps), default=-np.inf)
+        return None if ts == -np.inf else datetime.datetime.fromtimestamp(ts)
@@ -0,0 +1,295 @@
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import jsonlines as jsonl
+
+from blob_store import LazyJob, content_key
+from utils import datetime_parser, datetime_serializer, url_key
+
+
+job_kinds = ['scraped', 'seen', 'applied']
+
+
+def description_key(job: dict):
+    '''return the description key of a job, from its description_hash if it has one so a LazyJob's description isn't read'''
+    digest = dict.get(job, 'description_hash') or (content_key(job['description']) if job.get('description') else None)
+    return int(digest[:16], 16) if digest else None
+
+
+def pack_description(job: dict, blobs):
+    '''return a copy of job referencing its description in blobs by description_hash, instead of holding it'''
+    record = dict(job) # a LazyJob's description may not be loaded, it is then already referenced
+    if blobs is not None and record.get('description'):
+        record['description_hash'] = blobs.put(record.pop('description'))
+    return record
+
+
+def unpack_description(record: dict, blobs):
+    '''return record as a LazyJob if its description is referenced in blobs'''
+    return LazyJob(record, blobs) if blobs is not None and record.get('description_hash') else record
+
+
+class JsonlStorage():
+    '''
+    Job history kept in one jsonl file per kind of record (scraped, seen, applied), with dates truncated to days.
+    Records are read and written as job dicts, see AutoApply.get_jobs()
+    '''
+
+    def __init__(self, folder_name: str, filenames: dict, blobs=None) -> None:
+        '''
+        Parameters
+        ----------
+        folder_name : str
+            folder containing the files
+        filenames : dict
+            maps each kind of record ('scraped', 'seen', 'applied') to its file name
+        blobs : BlobStore, default None
+            if given, descriptions are stored once in it and records reference them by description_hash,
+            records read back are LazyJobs loading their description on first access
+        '''
+        self.paths = {kind: folder_name+filename for kind, filename in filenames.items()}
+        self.blobs = blobs
+
+    def append(self, kind: str, jobs: list[dict]):
+        '''append jobs to the records of a kind, the jobs themselves are not modified'''
+        with jsonl.open(self.paths[kind], 'a') as f:
+            f.write_all([datetime_serializer(pack_description(j, self.blobs)) for j in jobs])
+
+    def load(self, kind: str):
+        '''return every record of a kind, with dates parsed'''
+        return [datetime_parser(job) for job, _ in self.iter_records(kind)]
+
+    def iter_records(self, kind: str, cursor=0):
+        '''
+        yield records of a kind added after cursor, unparsed, without loading them all
+
+            Parameters
+            ----------
+            kind : str
+                'scraped', 'seen' or 'applied'
+            cursor : int, default 0
+                position after the last record already read, 0 to read from the start
+
+            Yields
+            ------
+            tuple[dict, int]
+                a record, and the cursor after it
+        '''
+        if not os.path.exists(self.paths[kind]):
+            return
+        with open(self.paths[kind], 'rb') as f:
+            f.seek(cursor)
+            for line in f:
+                if not line.endswith(b'\n'): # partly written line, leave it for later
+                    return
+                cursor += len(line)
+                if line.strip():
+                    yield unpack_description(json.loads(line), self.blobs), cursor
+
+    def fingerprint(self, kind: str, cursor: int, block=4096):
+        '''
+        return a fingerprint of the records of a kind before cursor, to pass to cursor_valid() later: a hash of the
+        start of the file and of the bytes just before cursor, so the whole file isn't read
+        '''
+        if not cursor or not os.path.exists(self.paths[kind]):
+            return ''
+        with open(self.paths[kind], 'rb') as f:
+            head = f.read(min(block, cursor))
+            f.seek(max(0, cursor - block))
+            tail = f.read(cursor - max(0, cursor - block))
+        return hashlib.blake2b(head + tail, digest_size=16).hexdigest()
+
+    def cursor_valid(self, kind: str, cursor: int, fingerprint: str=None):
+        '''return False if the records of a kind were rewritten since cursor and its fingerprint() were obtained'''
+        size = os.path.getsize(self.paths[kind]) if os.path.exists(self.paths[kind]) else 0
+        return cursor <= size and (fingerprint is None or fingerprint == self.fingerprint(kind, cursor))
+
+    def source(self, kind: str):
+        '''return an identifier of where records of a kind are kept, for indexes built over them'''
+        return 'jsonl:'+os.path.abspath(self.paths[kind])
+
+
+def signed(fp: int):
+    '''fingerprints are unsigned 64 bit, sqlite integers are signed'''
+    return fp - 2**64 if fp >= 2**63 else fp
+
+
+class SqliteStorage():
+    '''
+    Job history kept in a sqlite database in WAL mode, one table per kind of record (scraped, seen, applied),
+    with full precision dates and indexes on apply url, description fingerprint and dates
+    '''
+
+    columns = ['search_url', 'description_url', 'apply_url', 'description', 'date_scraped', 'date_seen', 'date_applied']
+    date_columns = ['date_scraped', 'date_seen', 'date_applied']
+
+    def __init__(self, path: str, blobs=None) -> None:
+        '''
+        Parameters
+        ----------
+        path : str
+            path of the database file, created if missing
+        blobs : BlobStore, default None
+            if given, descriptions are stored once in it and rows reference them by description_hash,
+            records read back are LazyJobs loading their description on first access
+        '''
+        self.path = path
+        self.blobs = blobs
+        self.local = threading.local() # sqlite connections can't be shared between threads
+        with self.transaction() as db:
+            for kind in job_kinds:
+                db.execute(f'''CREATE TABLE IF NOT EXISTS {kind}_jobs (
+                    id INTEGER PRIMARY KEY,
+                    search_url TEXT, description_url TEXT, apply_url TEXT, description TEXT,
+                    date_scraped TEXT, date_seen TEXT, date_applied TEXT,
+                    apply_url_key INTEGER, description_key INTEGER, extra TEXT)''')
+                db.execute(f'CREATE INDEX IF NOT EXISTS {kind}_apply_url ON {kind}_jobs (apply_url)')
+                db.execute(f'CREATE INDEX IF NOT EXISTS {kind}_apply_url_key ON {kind}_jobs (apply_url_key)')
+                db.execute(f'CREATE INDEX IF NOT EXISTS {kind}_description_key ON {kind}_jobs (description_key)')
+                db.execute(f'CREATE INDEX IF NOT EXISTS {kind}_date ON {kind}_jobs (date_{kind})')
+            db.execute('CREATE TABLE IF NOT EXISTS imports (source TEXT PRIMARY KEY, cursor INTEGER, fingerprint TEXT)')
+
+    @property
+    def db(self):
+        if not hasattr(self.local, 'db'):
+            self.local.db = sqlite3.connect(self.path, isolation_level=None)
+            self.local.db.execute('PRAGMA journal_mode=WAL')
+            self.local.db.execute('PRAGMA synchronous=NORMAL')
+        return self.local.db
+
+    @contextmanager
+    def transaction(self):
+        '''group every write made inside the with block into one transaction'''
+        if getattr(self.local, 'in_transaction', False): # nested, the outer block commits
+            yield self.db
+            return
+        self.local.in_transaction = True
+        self.db.execute('BEGIN')
+        try:
+            yield self.db
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        finally:
+            self.local.in_transaction = False
+
+    def to_row(self, job: dict):
+        key = description_key(job)
+        job = pack_description(job, self.blobs)
+        row = [job.get(c) for c in self.columns]
+        for i, c in enumerate(self.columns):
+            if isinstance(row[i], datetime.datetime):
+                row[i] = row[i].isoformat()
+        extra = {k: v for k, v in job.items() if k not in self.columns}
+        row.append(signed(url_key(job['apply_url'])) if job.get('apply_url') else None)
+        row.append(signed(key) if key is not None else None)
+        row.append(json.dumps(extra, default=lambda v: v.isoformat() if isinstance(v, datetime.datetime) else str(v)) if extra else None)
+        return row
+
+    def to_record(self, row: tuple):
+        record = {c: v for c, v in zip(self.columns, row) if v is not None or c in ['search_url', 'apply_url', 'description']}
+        if row[len(self.columns)]:
+            record.update(json.loads(row[len(self.columns)]))
+        if record.get('description_hash') and record.get('description') is None:
+            del record['description']
+        return unpack_description(record, self.blobs)
+
+    def append(self, kind: str, jobs: list[dict]):
+        '''append jobs to the records of a kind in one transaction, the jobs themselves are not modified'''
+        with self.transaction() as db:
+            db.executemany(f'INSERT INTO {kind}_jobs ({", ".join(self.columns)}, apply_url_key, description_key, extra) VALUES ({", ".join("?"*(len(self.columns)+3))})',
+                           [self.to_row(j) for j in jobs])
+
+    def load(self, kind: str):
+        '''return every record of a kind, with dates parsed'''
+        jobs = []
+        for job, _ in self.iter_records(kind):
+            for c in self.date_columns:
+                if c in job:
+                    job[c] = datetime.datetime.fromisoformat(job[c])
+            jobs.append(job)
+        return jobs
+
+    def iter_records(self, kind: str, cursor=0):
+        '''
+        yield records of a kind added after cursor, with dates as iso strings
+
+            Parameters
+            ----------
+            kind : str
+                'scraped', 'seen' or 'applied'
+            cursor : int, default 0
+                id of the last record already read, 0 to read from the start
+
+            Yields
+            ------
+            tuple[dict, int]
+                a record, and the cursor after it
+        '''
+        rows = self.db.execute(f'SELECT id, {", ".join(self.columns)}, extra FROM {kind}_jobs WHERE id > ? ORDER BY id', (cursor,))
+        for row in rows:
+            yield self.to_record(row[1:]), row[0]
+
+    def fingerprint(self, kind: str, cursor: int):
+        '''return a fingerprint of the records of a kind up to cursor, to pass to cursor_valid() later: a hash of the first one and of the one at cursor'''
+        rows = self.db.execute(f'SELECT * FROM {kind}_jobs WHERE id = (SELECT min(id) FROM {kind}_jobs) OR id = ? ORDER BY id', (cursor,)).fetchall()
+        return hashlib.blake2b(repr(rows).encode('utf-8'), digest_size=16).hexdigest() if cursor else ''
+
+    def cursor_valid(self, kind: str, cursor: int, fingerprint: str=None):
+        '''return False if the records of a kind were rewritten since cursor and its fingerprint() were obtained'''
+        return cursor <= (self.db.execute(f'SELECT max(id) FROM {kind}_jobs').fetchone()[0] or 0) and (fingerprint is None or fingerprint == self.fingerprint(kind, cursor))
+
+    def source(self, kind: str):
+        '''return an identifier of where records of a kind are kept, for indexes built over them'''
+        return 'sqlite:'+os.path.abspath(self.path)+':'+kind
+
+    def import_jsonl(self, jsonl_storage: JsonlStorage):
+        '''
+        copy the records of a JsonlStorage into this database, in one transaction.
+        How far each file was imported is recorded, so importing the same files again only copies the records appended since
+
+            Parameters
+            ----------
+            jsonl_storage : JsonlStorage
+                the jsonl files to import
+
+            Returns
+            -------
+            dict
+                number of records imported per kind
+        '''
+        counts = {}
+        with self.transaction() as db:
+            for kind in job_kinds:
+                if kind not in jsonl_storage.paths:
+                    continue
+                source = jsonl_storage.source(kind)
+                cursor, fingerprint = db.execute('SELECT cursor, fingerprint FROM imports WHERE source = ?', (source,)).fetchone() or (0, None)
+                if not jsonl_storage.cursor_valid(kind, cursor, fingerprint):
+                    print('Warning:', jsonl_storage.paths[kind], 'was rewritten since it was imported, not importing it again')
+                    continue
+                jobs = []
+                for job, cursor in jsonl_storage.iter_records(kind, cursor):
+                    jobs.append(datetime_parser(job))
+                self.append(kind, jobs)
+                db.execute('INSERT OR REPLACE INTO imports VALUES (?, ?, ?)', (source, cursor, jsonl_storage.fingerprint(kind, cursor)))
+                counts[kind] = len(jobs)
+        return counts
+
+
+if __name__ == '__main__':
+    # import of a folder's jsonl history (of what was appended since, when run again) into the sqlite database AutoApply(storage='sqlite') uses
+    import sys
+    folder_name = sys.argv[1] if len(sys.argv) > 1 else 'file_templates/'
+    if not folder_name.endswith('/'):
+        folder_name += '/'
+    from blob_store import BlobStore
+    blobs = BlobStore(folder_name+'descriptions.pack')
+    jsonl_storage = JsonlStorage(folder_name, {'scraped': 'scraped_jobs.jsonl', 'seen': 'seen_jobs.jsonl', 'applied': 'applied_jobs.jsonl'}, blobs)
+    print(SqliteStorage(folder_name+'jobs.sqlite3', blobs).import_jsonl(jsonl_storage))
@@ -1,4 +1,8 @@
 import datetime
+import hashlib
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
 
 def datetime_parser(dct):
     for k, v in dct.items():
@@ -16,4 +20,48 @@ def datetime_serializer(dct):
                 dct[k] = datetime.datetime.strftime(v, "%Y-%m-%d")
             except:
                 pass
-    return dct
\ No newline at end of file
+    return dct
+
+class UnkStripper():
+    '''
+    removes characters unknown to a tokenizer from strings,
+    each distinct character is only ever tokenized once
+    '''
+
+    def __init__(self, tokenizer, unk_id=104) -> None:
+        self.tokenizer = tokenizer
+        self.unk_id = unk_id
+        self.seen_chars = set()
+        self.unk_table = {} # str.translate table deleting every unknown character seen so far
+
+    def __call__(self, strings):
+        new_chars = list(set().union(*strings) - self.seen_chars)
+        if new_chars:
+            # same test as tokenizing each character on its own: first token after the start token is [UNK]
+            ids = self.tokenizer(new_chars)['input_ids']
+            self.unk_table.update({ord(c): None for c, i in zip(new_chars, ids) if i[1] == self.unk_id})
+            self.seen_chars.update(new_chars)
+        return [s.translate(self.unk_table) for s in strings]
+
+
+def url_key(url):
+    '''
+    return a compact fingerprint of a job url: indeed urls are identified by their job key (jk) whatever their tracking parameters,
+    other urls by their host, path and query
+    '''
+    parsed = urlparse(url)
+    jk = parse_qs(parsed.query).get('jk')
+    ident = parsed.netloc + '|jk=' + jk[0] if jk else parsed.netloc + parsed.path + '?' + parsed.query
+    return int.from_bytes(hashlib.blake2b(ident.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def text_key(text):
+    '''return a compact fingerprint of a text, e.g. a job description'''
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def cosine_similarity(a, b):
+    '''return the matrix of cosine similarities between the rows of a and b, zero vectors have zero similarity'''
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    a_norms, b_norms = np.linalg.norm(a, axis=1, keepdims=True), np.linalg.norm(b, axis=1, keepdims=True)
+    return (a / np.where(a_norms == 0, 1, a_norms)) @ (b / np.where(b_norms == 0, 1, b_norms)).T